@@ -0,0 +1,123 @@
+""" Adaptive angular sampling - refines a coarse theta/phi grid only where the pattern changes quickly (main beam, sidelobes & nulls)."""
+import numpy as np
+
+KEY_DECIMALS = 9                                                                # Angles (degrees) are rounded to this before use as sample keys
+CELL_POINTS = np.array([[0, 0], [1, 0], [0, 1], [1, 1],                         # Corners, then centre & edge midpoints as (theta, phi) fractions of cell
+                        [0.5, 0.5], [0.5, 0], [0.5, 1], [0, 0.5], [1, 0.5]])
+MIDPOINT_CORNERS = np.array([[0, 1, 2, 3], [0, 1, 0, 1], [2, 3, 2, 3], [0, 2, 0, 2], [1, 3, 1, 3]])  # Corners each centre/midpoint lies between
+SPLIT_POINTS = 16                                                               # Most new points from splitting a cell, 5 x 5 minus its 9
+
+
+class ScatteredPattern:
+    """
+    Complex field at scattered (theta, phi) points in degrees, i.e. from RefinePattern.
+    Points cover theta [0, ThetaStop] & phi [0, PhiStop] inclusive, Plotting.InterpolatePattern resamples onto an AngularGrid.
+    """
+
+    def __init__(self, theta, phi, field):
+        self.theta = np.asarray(theta, dtype=float)
+        self.phi = np.asarray(phi, dtype=float)
+        self.field = np.asarray(field)
+
+    @classmethod
+    def Load(cls, path):
+        data = np.load(path)
+        return cls(data['theta'], data['phi'], data['field'])
+
+    def Save(self, path):
+        np.savez(path, theta=self.theta, phi=self.phi, field=self.field)
+
+    @property
+    def size(self):
+        return len(self.field)
+
+    def __repr__(self):
+        return "ScatteredPattern({} points)".format(self.size)
+
+
+def RefinePattern(function, ThetaStop=90, PhiStop=360, CoarseStep=5, ToleranceDb=0.05, DetailDb=-20, GradientDb=10, FloorDb=-40, MaxLevel=6,
+                  MaxSamples=None):
+    """
+    Samples function(thetaDeg, phiDeg) -> complex field (matching flat arrays, degrees) on a coarse CoarseStep grid of cells,
+    then splits cells in four (quadtree) while either:
+    - dB curvature, the error of the cell centre & edge midpoints vs linear interpolation between the corners, exceeds ToleranceDb.
+      Only levels above DetailDb count, so the main beam & high sidelobes (beamwidth, peak sidelobe) are resolved finely
+    - dB gradient, the spread of levels across the cell, exceeds GradientDb, resolving nulls
+    Levels are relative to the peak found so far and clipped at FloorDb, so nulls are resolved down to FloorDb but no deeper.
+    Cells are split at most MaxLevel times (finest step CoarseStep / 2^MaxLevel), each point is evaluated once and all new
+    points of a level are evaluated in one call. MaxSamples (if given) budgets the evaluations: once a level's splits would exceed
+    it, only the cells furthest outside tolerance are split, so the pattern has at most MaxSamples points (beyond the coarse grid).
+    Returns ScatteredPattern.
+    """
+    noTheta = max(1, int(round(ThetaStop / CoarseStep)))
+    noPhi = max(1, int(round(PhiStop / CoarseStep)))
+    cellTheta = ThetaStop / noTheta
+    cellPhi = PhiStop / noPhi
+    theta0, phi0 = np.meshgrid(np.arange(noTheta) * cellTheta, np.arange(noPhi) * cellPhi)
+    cells = np.column_stack((theta0.ravel(), phi0.ravel()))                     # Cell origin (theta, phi)
+
+    samples = {}
+    for level in range(MaxLevel + 1):
+        theta = cells[:, 0:1] + CELL_POINTS[:, 0] * cellTheta                   # [cell][point]
+        phi = cells[:, 1:2] + CELL_POINTS[:, 1] * cellPhi
+        field = Evaluate(function, samples, theta.ravel(), phi.ravel()).reshape(theta.shape)
+        if level == MaxLevel:
+            break
+
+        peak = max(np.max(np.abs(list(samples.values()))), 1e-300)
+        levelDb = np.maximum(20 * np.log10(np.abs(field) / peak + 1e-300), FloorDb)
+        detailDb = np.maximum(levelDb, DetailDb)
+        predicted = detailDb[:, MIDPOINT_CORNERS].mean(axis=2)                  # Linear interpolation of corners at centre & midpoints
+        curvature = np.max(np.abs(detailDb[:, 4:] - predicted), axis=1)
+        gradient = np.ptp(levelDb, axis=1)
+
+        score = np.maximum(curvature / ToleranceDb, gradient / GradientDb)       # > 1 outside tolerance
+        split = np.flatnonzero(score > 1)
+        if MaxSamples is not None:
+            budget = max(0, (MaxSamples - len(samples)) // SPLIT_POINTS)
+            if len(split) > budget:                                             # Worst cells first, in their original order
+                split = np.sort(split[np.argsort(-score[split], kind='stable')[:budget]])
+        parents = cells[split]
+        if len(parents) == 0:
+            break
+        cellTheta /= 2
+        cellPhi /= 2
+        cells = np.concatenate([parents + [thetaOffset * cellTheta, phiOffset * cellPhi] for thetaOffset, phiOffset in CELL_POINTS[:4]])
+
+    keys = list(samples)
+    return ScatteredPattern([key[0] for key in keys], [key[1] for key in keys], [samples[key] for key in keys])
+
+
+def Evaluate(function, samples, theta, phi):
+    """Field at each (theta, phi), evaluating function only at points not already in samples {(theta, phi): field}."""
+    keys = list(zip(np.round(theta, KEY_DECIMALS), np.round(phi, KEY_DECIMALS)))
+    new = list(dict.fromkeys(key for key in keys if key not in samples))       # Unique, in order
+    if new:
+        newPoints = np.array(new)
+        samples.update(zip(new, np.ravel(function(newPoints[:, 0], newPoints[:, 1]))))
+
+    return np.array([samples[key] for key in keys])
+
+
+def GridFunction(field, grid):
+    """
+    function(thetaDeg, phiDeg) bilinearly interpolating complex field[phi][theta] solved over grid, for RefinePattern.
+    Only suitable for smooth patterns, i.e. a single element at the origin. Phi wraps around 360°, theta is clamped to the grid.
+    """
+    thetaGrid = grid.theta
+    phiGrid = np.append(grid.phi, grid.phi[0] + 360)
+    field = np.vstack((field, field[:1]))
+
+    def Interpolate(thetaDeg, phiDeg):
+        theta = np.clip(thetaDeg, thetaGrid[0], thetaGrid[-1])
+        phi = np.mod(phiDeg - phiGrid[0], 360) + phiGrid[0]
+        thetaIndex = np.clip(np.searchsorted(thetaGrid, theta) - 1, 0, len(thetaGrid) - 2)
+        phiIndex = np.clip(np.searchsorted(phiGrid, phi) - 1, 0, len(phiGrid) - 2)
+        thetaFraction = (theta - thetaGrid[thetaIndex]) / (thetaGrid[thetaIndex + 1] - thetaGrid[thetaIndex])
+        phiFraction = (phi - phiGrid[phiIndex]) / (phiGrid[phiIndex + 1] - phiGrid[phiIndex])
+
+        lower = (1 - thetaFraction) * field[phiIndex, thetaIndex] + thetaFraction * field[phiIndex, thetaIndex + 1]
+        upper = (1 - thetaFraction) * field[phiIndex + 1, thetaIndex] + thetaFraction * field[phiIndex + 1, thetaIndex + 1]
+        return (1 - phiFraction) * lower + phiFraction * upper
+
+    return Interpolate
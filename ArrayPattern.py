@@ -0,0 +1,171 @@
+""" Requestor side array factor, used to build array patterns from a single element pattern (pattern multiplication)."""
+import math
+import numpy as np
+
+MAX_CHUNK_BYTES = 64e6                                                          # Memory bound for the complex steering matrix of one chunk of angles
+STANDARD_COLUMNS = 5                                                            # xPos, yPos, zPos, ElementAmplitude, ElementPhaseWeight
+
+
+def IdenticalElements(ElementArray):
+    """
+    True if elements differ only by position, amplitude & phase weight, so the array pattern = element pattern x array factor.
+    Any columns after the standard five (i.e. element type or orientation) must be the same for every element.
+    """
+    ElementArray = np.atleast_2d(ElementArray)
+    if ElementArray.shape[1] <= STANDARD_COLUMNS:
+        return True
+
+    return bool(np.all(ElementArray[:, STANDARD_COLUMNS:] == ElementArray[0, STANDARD_COLUMNS:]))
+
+
+def ReferenceElement():
+    """Element used to solve the embedded element pattern once: at origin, unit amplitude, no phase weight."""
+    return np.array([[0, 0, 0, 1, 0]], dtype=float)
+
+
+def RectangularLayout(ElementArray):
+    """
+    Splits a rectangular lattice of elements (every x position paired with every y position, constant z) into its axes.
+    Spacing along each axis needn't be uniform. Returns (x, y, z, weights[x][y]) or None for any other layout.
+    """
+    ElementArray = np.atleast_2d(ElementArray)
+    x, xIndex = np.unique(ElementArray[:, 0], return_inverse=True)
+    y, yIndex = np.unique(ElementArray[:, 1], return_inverse=True)
+    if len(x) * len(y) != len(ElementArray) or np.any(ElementArray[:, 2] != ElementArray[0, 2]):
+        return None
+
+    weights = np.zeros((len(x), len(y)), dtype=complex)
+    filled = np.zeros((len(x), len(y)), dtype=bool)
+    weights[xIndex, yIndex] = ElementArray[:, 3] * np.exp(ElementArray[:, 4] * 1j)
+    filled[xIndex, yIndex] = True
+    if not np.all(filled):                                                      # Repeated positions leave holes in the lattice
+        return None
+
+    return x, y, ElementArray[0, 2], weights
+
+
+def ArrayFactorComplex(ElementArray, Freq, grid, MaxChunkBytes=MAX_CHUNK_BYTES):
+    """
+    Complex array factor over grid, returns arrayFactor[phi][theta], see ArrayFactorPoints.
+    Element = xPos, yPos, zPos, ElementAmplitude, ElementPhaseWeight
+    """
+    thetaDeg, phiDeg = np.meshgrid(grid.theta, grid.phi)                                                        # Grids of form [phi][theta]
+
+    return ArrayFactorPoints(ElementArray, Freq, thetaDeg, phiDeg, MaxChunkBytes)
+
+
+def ArrayFactorPoints(ElementArray, Freq, thetaDeg, phiDeg, MaxChunkBytes=MAX_CHUNK_BYTES):
+    """
+    Array factor at scattered points, thetaDeg & phiDeg are matching arrays of any shape (degrees), i.e. adaptive refinement samples.
+    Rectangular lattices (i.e. from GenerateElementArray) use the separable form, any other layout the general point sum.
+    """
+    layout = RectangularLayout(ElementArray)
+    if layout is not None:
+        arrayFactor = SeparableArrayFactorPoints(layout, Freq, thetaDeg, phiDeg, MaxChunkBytes)
+        if arrayFactor is not None:
+            return arrayFactor
+
+    return PointArrayFactorPoints(ElementArray, Freq, thetaDeg, phiDeg, MaxChunkBytes)
+
+
+def SteeringSum(directions, positions, weights, MaxChunkBytes=MAX_CHUNK_BYTES):
+    """
+    Sum over elements of the steering matrix e^j(k.r) [angles x elements] x weights, the kernel of every array factor here.
+    directions[angle][axis] are unit vector components, positions[element][axis] are k x element position along the same axes,
+    weights[element] (or [element][column] for several weightings at once) are Amp * e^j(Phase Weight).
+    Angles are processed in chunks so the steering matrix never exceeds MaxChunkBytes. Returns sum[angle] (or [angle][column]).
+    """
+    elementSum = np.empty((len(directions),) + np.shape(weights)[1:], dtype=complex)
+
+    chunkSize = max(1, int(MaxChunkBytes // (16 * len(positions))))                                              # complex128 = 16 bytes per steering term
+    for start in range(0, len(directions), chunkSize):
+        stop = start + chunkSize
+        steering = np.exp(np.dot(directions[start:stop], positions.T) * 1j)
+        elementSum[start:stop] = np.dot(steering, weights)
+
+    return elementSum
+
+
+def PointArrayFactor(ElementArray, Freq, grid, MaxChunkBytes=MAX_CHUNK_BYTES):
+    """Array factor of an arbitrary layout over grid, returns arrayFactor[phi][theta]."""
+    thetaDeg, phiDeg = np.meshgrid(grid.theta, grid.phi)
+
+    return PointArrayFactorPoints(ElementArray, Freq, thetaDeg, phiDeg, MaxChunkBytes)
+
+
+def PointArrayFactorPoints(ElementArray, Freq, thetaDeg, phiDeg, MaxChunkBytes=MAX_CHUNK_BYTES):
+    """Array factor of an arbitrary layout at scattered points (degrees), summing every element's contribution, see SteeringSum."""
+    ElementArray = np.atleast_2d(ElementArray)
+
+    theta = np.radians(np.ravel(thetaDeg))
+    phi = np.radians(np.ravel(phiDeg))
+    directions = np.column_stack((np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)))
+
+    phaseConstant = 2 * math.pi * Freq / 3e8
+    weights = ElementArray[:, 3] * np.exp(ElementArray[:, 4] * 1j)
+    arrayFactor = SteeringSum(directions, phaseConstant * ElementArray[:, 0:3], weights, MaxChunkBytes)
+
+    return arrayFactor.reshape(np.shape(thetaDeg))
+
+
+def SeparableArrayFactor(layout, Freq, grid, MaxChunkBytes=MAX_CHUNK_BYTES, Tolerance=1e-12):
+    """Array factor of a rectangular lattice over grid, returns arrayFactor[phi][theta] or None if there's no saving."""
+    thetaDeg, phiDeg = np.meshgrid(grid.theta, grid.phi)
+
+    return SeparableArrayFactorPoints(layout, Freq, thetaDeg, phiDeg, MaxChunkBytes, Tolerance)
+
+
+def SeparableArrayFactorPoints(layout, Freq, thetaDeg, phiDeg, MaxChunkBytes=MAX_CHUNK_BYTES, Tolerance=1e-12):
+    """
+    Array factor of a rectangular lattice (see RectangularLayout) at scattered points (degrees), None if there's no saving.
+    With weights[x][y] = sum over r of s_r * a_r * b_r^T (SVD), AF = e^j(k.z.cos(theta)) * sum over r of s_r * AFx(a_r) * AFy(b_r),
+    the product of linear array factors along x & y (each a SteeringSum). Separable tapers (i.e. uniform, Taylor x Taylor) are rank 1,
+    so cost is angles x (X + Y) rather than angles x X x Y. Singular values below Tolerance x largest are dropped.
+    """
+    x, y, z, weights = layout
+    a, s, b = np.linalg.svd(weights, full_matrices=False)
+    rank = max(1, int(np.count_nonzero(s > Tolerance * s[0])))
+    if rank * (len(x) + len(y)) >= len(x) * len(y):
+        return None
+    a = a[:, :rank] * s[:rank]
+    b = b[:rank, :].T
+
+    theta = np.radians(np.ravel(thetaDeg))
+    phi = np.radians(np.ravel(phiDeg))
+    u = np.sin(theta) * np.cos(phi)
+    v = np.sin(theta) * np.sin(phi)
+
+    phaseConstant = 2 * math.pi * Freq / 3e8
+    xFactors = SteeringSum(u[:, np.newaxis], phaseConstant * x[:, np.newaxis], a, MaxChunkBytes)                  # [angle][rank] linear array factors along x
+    yFactors = SteeringSum(v[:, np.newaxis], phaseConstant * y[:, np.newaxis], b, MaxChunkBytes)
+    arrayFactor = np.exp(phaseConstant * z * np.cos(theta) * 1j) * np.sum(xFactors * yFactors, axis=1)
+
+    return arrayFactor.reshape(np.shape(thetaDeg))
+
+
+def PatternMultiply(elementField, ElementArray, Freqs, grid):
+    """
+    Array pattern from the embedded pattern of the reference element (see ReferenceElement) x array factor, at each frequency.
+    Valid for identical elements in the far field, where the local angle difference between elements is negligible.
+    elementField[freq][phi][theta], returns fsp[freq][phi][theta]
+    """
+    fsp = np.empty(elementField.shape, dtype=complex)
+    for freqNo, Freq in enumerate(Freqs):
+        fsp[freqNo] = elementField[freqNo] * ArrayFactorComplex(ElementArray, Freq, grid)
+
+    return fsp
+
+
+def EmbeddedPatterns(elementField, ElementArray, Freq, grid):
+    """
+    Unit weight pattern of each element [element][point] for identical elements: reference element pattern x relative phase of element.
+    Holds elements x grid points, used when each element's contribution is needed separately (i.e. beam steering sweeps).
+    """
+    ElementArray = np.atleast_2d(ElementArray)
+    positions = np.column_stack((ElementArray[:, 0:3], np.ones(len(ElementArray)), np.zeros(len(ElementArray))))   # Unit amplitude, no phase weight
+
+    patterns = np.empty((len(ElementArray), grid.size), dtype=np.complex64)
+    for elementNo, element in enumerate(positions):
+        patterns[elementNo] = np.ravel(elementField * ArrayFactorComplex(element, Freq, grid))
+
+    return patterns
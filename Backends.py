@@ -0,0 +1,314 @@
+""" Execution backends that run the element type runAnalysis.py plug-in for each batch of elements."""
+import asyncio
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from Results import BatchResultPath
+from TaskMetrics import RunReport, GolemStepTimer, BatchMetricsPath, WORKER_METRICS
+
+try:
+    from yapapi import Executor, Task, WorkContext
+    from yapapi.log import enable_default_logger, log_summary
+    from yapapi.package import vm
+except ImportError:                                                             # yapapi only needed for Golem backend
+    Executor = None
+
+"""
+Plug-in contract, the same for every backend:
+Inputs.....every file in the element type folder + ./elements/physics.csv, frequencies.csv, grid.npz & ./elements/batchN.npz (as batch.npz)
+           All but batch.npz are the same for every task, so are packed once per run in a content hashed bundle (see BuildBundle)
+           which is sent & unpacked once per provider activity, each task then only sends its batch.npz
+Run........python3 runAnalysis.py in the folder holding the inputs, stdout written to output.txt (replaced each task)
+Outputs....output.txt -> ./results/outputN.txt, elementresult.npz -> ./results/batchresultN.npz, metrics.json -> ./results/metricsN.json
+Backends record each batch's step timings in their RunReport, see TaskMetrics.py, and add each batch's fields to their accumulator
+(a Results.FieldAccumulator) before yielding it
+"""
+SHARED_INPUTS = ('physics.csv', 'frequencies.csv', 'grid.npz')
+RETRY_SHARE = 0.2                                                                # Share of the Golem budget the first run leaves for retries & copies
+
+
+def BatchInputPath(batchNo):
+    return './elements/batch' + str(batchNo) + '.npz'
+
+
+def BatchOutputPath(batchNo):
+    return './results/output' + str(batchNo) + '.txt'
+
+
+def BuildBundle(type, files):
+    """
+    Packs the element type plug-in files & shared inputs into ./elements/bundle-<hash>.tar.gz, returns (path, hash).
+    Hash covers file names & contents only (not timestamps), so an unchanged plug-in & physics always give the same bundle.
+    """
+    members = [(file, os.path.join(type, file)) for file in sorted(files)
+               if os.path.isfile(os.path.join(type, file)) and not file.endswith('.pyc')]        # Skips i.e. __pycache__
+    members += [(file, './elements/' + file) for file in SHARED_INPUTS]
+
+    contents = []
+    digest = hashlib.sha256()
+    for name, path in members:
+        with open(path, 'rb') as f:
+            data = f.read()
+        contents.append((name, data))
+        digest.update(name.encode())
+        digest.update(data)
+
+    bundleHash = digest.hexdigest()[:16]
+    path = './elements/bundle-' + bundleHash + '.tar.gz'
+    for file in os.listdir('./elements'):                                       # Bundles of previous plug-in/physics versions
+        if file.startswith('bundle-') and file != os.path.basename(path):
+            os.remove(os.path.join('./elements', file))
+    if not os.path.exists(path):
+        with tarfile.open(path, 'w:gz') as bundle:
+            for name, data in contents:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                bundle.addfile(info, io.BytesIO(data))
+
+    return path, bundleHash
+
+
+class TaskFailed(RuntimeError):
+    """Raised by a backend's Run after yielding every batch that succeeded, batchNos lists those that failed."""
+
+    def __init__(self, batchNos, errors):
+        super().__init__("Batches " + ", ".join(str(batchNo) for batchNo in batchNos) + " failed: " + "; ".join(errors))
+        self.batchNos = batchNos
+
+
+class GolemBackend:
+    """Runs batches on Golem providers through yapapi Executor."""
+
+    name = 'golem'
+
+    def __init__(self, type, files, workers=3, budget=10.0, timeout=timedelta(minutes=10), subnet="community.3", report=None, accumulator=None):
+        if Executor is None:
+            raise ImportError("yapapi is required for the Golem backend, see requirements.txt")
+
+        self.type = type
+        self.files = files
+        self.workers = workers
+        self.report = report if report is not None else RunReport()
+        self.accumulator = accumulator
+        self.budget = budget
+        self.timeout = timeout
+        self.subnet = subnet
+        self.spent = 0.0                                                        # GLM accepted for payment, over every Run
+        self.reserved = 0.0                                                     # Allocated to running Runs & not yet spent
+        self.runs = 0
+
+        enable_default_logger()
+
+    def Close(self):
+        """Nothing to release, each Run's Executor is closed as it ends."""
+
+    def Payments(self, wrapped, runSpent):
+        """
+        yapapi event consumer moving accepted invoice amounts from reserved to spent (& adding them to runSpent[0], the Run's total),
+        then passing events on to wrapped.
+        """
+        def Consumer(event):
+            if type(event).__name__ == 'PaymentAccepted':
+                self.spent += float(event.amount)
+                self.reserved -= float(event.amount)
+                runSpent[0] += float(event.amount)
+            wrapped(event)
+
+        return Consumer
+
+    async def Run(self, batchNos, onFailure=None):
+        """
+        Yields each batch number as its result is downloaded into ./results (and added to the accumulator).
+        Each call is a separate Executor, so overlapping runs (i.e. retries & speculative copies) get their own providers.
+        Every call draws on the one budget, reserving its Executor's budget as it starts: the first run gets what's left less
+        RETRY_SHARE of the budget, later runs (i.e. retries & speculative copies, overlapping it) half of what's neither spent nor
+        reserved. What a run doesn't spend is released when it ends. Raises RuntimeError if nothing is left.
+        Failures end the run, onFailure is accepted for the same interface as LocalBackend.
+        """
+        available = self.budget - self.spent - self.reserved
+        budget = available - RETRY_SHARE * self.budget if self.runs == 0 else available / 2
+        if budget <= 0:
+            raise RuntimeError("Budget of " + str(self.budget) + " GLM spent or reserved by running tasks")
+        self.runs += 1
+        self.reserved += budget
+        runSpent = [0.0]
+        try:
+            package = await vm.repo(
+                image_hash="7c78a5c3da0f3ea1c03c8a87c4a1055c7d8035f2c108c4d9db443f56",
+                min_mem_gib=0.5,
+                min_storage_gib=2.0,
+            )
+
+            # Element type folder (must have a runAnalysis.py file, allows for many different Element types to be analysed!) and
+            # physics file which contains freq, etc, frequencies to solve at & theta/phi grid to solve over, packed once for every task
+            bundlePath, bundleHash = BuildBundle(self.type, self.files)
+            print(f"Plug-in bundle {bundleHash}: {os.path.getsize(bundlePath)} bytes")
+
+            async def worker(ctx: WorkContext, tasks):
+                # One worker per provider activity, /golem/work persists between its tasks so only the first task sends the bundle
+                print("WORKER")
+                bundleSent = False
+                async for task in tasks:
+                    print("Worker for batch no: " + str(task.data))
+                    unpack = ""
+                    if not bundleSent:
+                        ctx.send_file(bundlePath, f"/golem/work/bundle-{bundleHash}.tar.gz")
+                        unpack = f"tar -xzf /golem/work/bundle-{bundleHash}.tar.gz -C /golem/work && "
+                        bundleSent = True
+                    # Sends packed element info for batch
+                    ctx.send_file(BatchInputPath(task.data), "/golem/work/batch.npz")
+
+                    print("Files sent, running analysis...")
+                    # Process all elements in batch, output.txt replaced as /golem/work persists between tasks
+                    # Plug-ins without metrics get an empty record, so the download below can't fail
+                    ctx.run("/bin/sh", "-c", f"{unpack}python3 /golem/work/runAnalysis.py > /golem/work/output.txt && "
+                                             f"([ -f /golem/work/{WORKER_METRICS} ] || echo '{{}}' > /golem/work/{WORKER_METRICS})")
+                    print("Downloading outputs...")
+                    # Can use to check processing ran ok
+                    ctx.download_file("/golem/work/output.txt", BatchOutputPath(task.data))
+                    # Actual result for elements in batch, downloaded to a temporary name then replaced atomically, as the requestor
+                    # may be reading (memory mapped) the result of another copy of the batch
+                    downloadPath = BatchResultPath(task.data) + '.' + str(id(ctx))
+                    ctx.download_file("/golem/work/elementresult.npz", downloadPath)
+                    # Worker side solve time, memory & points
+                    ctx.download_file("/golem/work/" + WORKER_METRICS, BatchMetricsPath(task.data))
+                    yield ctx.commit()
+                    os.replace(downloadPath, BatchResultPath(task.data))
+                    task.accept_result()
+
+            async with Executor(
+                package=package,
+                max_workers=self.workers,
+                budget=budget,
+                timeout=self.timeout,
+                subnet_tag=self.subnet,
+                event_consumer=GolemStepTimer(self.report, self.Payments(log_summary(), runSpent)),
+            ) as executor:
+                async for task in executor.submit(worker, [Task(data=batchNo) for batchNo in batchNos]):                     # yapapi retries failed tasks
+                    print(f"Worker Done: {task}")
+                    if self.accumulator is not None:
+                        self.accumulator.AddBatch(task.data)
+                    yield task.data
+
+        finally:
+            self.reserved -= budget - runSpent[0]                               # Releases what the run didn't spend
+
+class LocalBackend:
+    """Runs batches on this machine using a pool of worker processes, no yagna daemon, network or budget needed."""
+
+    name = 'local'
+
+    def __init__(self, type, files, workers=os.cpu_count(), report=None, accumulator=None):
+        self.type = type
+        self.files = files
+        self.workers = workers
+        self.report = report if report is not None else RunReport()
+        self.accumulator = accumulator
+        self.pool = None                                                        # Shared by every Run until Close
+        self.futures = set()                                                    # Batches submitted to pool & not finished
+
+    async def Run(self, batchNos, onFailure=None):
+        """
+        Yields each batch number as its result is written into ./results (and added to the accumulator).
+        A failed batch doesn't stop the others: onFailure(batchNo, error) is called as it fails, or without onFailure
+        TaskFailed is raised once the others have finished. Runs can overlap (i.e. retries), sharing the pool's workers.
+        """
+        loop = asyncio.get_event_loop()
+        bundlePath, bundleHash = BuildBundle(self.type, self.files)
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+        submitted = time.time()
+        futures = [loop.run_in_executor(self.pool, RunLocalBatch, bundlePath, batchNo) for batchNo in batchNos]
+        self.futures.update(futures)
+        for future in futures:
+            future.add_done_callback(self.futures.discard)
+        failed = {}
+        for future in asyncio.as_completed(futures):
+            try:
+                batchNo, started, steps = await future
+            except BatchError as error:
+                if onFailure is not None:
+                    onFailure(error.batchNo, error)
+                else:
+                    failed[error.batchNo] = str(error)
+                continue
+            if self.accumulator is not None:
+                self.accumulator.AddBatch(batchNo)
+            self.report.Record(batchNo, provider='local', queue_s=started - submitted, total_s=sum(steps.values()), **steps)
+            print(f"Local Worker Done: batch {batchNo}")
+            yield batchNo
+
+        if failed:
+            raise TaskFailed(sorted(failed), list(failed.values()))
+
+    def Close(self):
+        """
+        Shuts down the worker pool without waiting: batches not started are cancelled, those still running (i.e. losing speculative
+        copies) finish in the background.
+        """
+        for future in list(self.futures):                                       # Cancels the pool's queued call too
+            future.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+
+class BatchError(RuntimeError):
+    """Failure of a local batch, raised in the pool process (so must pickle, hence args only)."""
+
+    def __init__(self, batchNo, message):
+        super().__init__(batchNo, message)
+        self.batchNo = batchNo
+
+    def __str__(self):
+        return "batch " + str(self.args[0]) + ": " + str(self.args[1])
+
+
+def RunLocalBatch(bundlePath, batchNo):
+    """
+    Runs runAnalysis.py for one batch in a fresh work dir holding the unpacked bundle (see BuildBundle), mirroring /golem/work on a provider,
+    then copies outputs into ./results.
+    Runs in a pool process so must be a module level function.
+    Returns (batchNo, start time, {step: seconds}) with the same send/run/download steps as a Golem task, raises BatchError on failure.
+    The result file is replaced atomically, as a speculative copy of the batch may be writing it while it's being read.
+    """
+    started = time.time()
+    workDir = tempfile.mkdtemp(prefix='golem-array-')
+    try:
+        with tarfile.open(bundlePath, 'r:gz') as bundle:
+            bundle.extractall(workDir)
+        shutil.copy(BatchInputPath(batchNo), os.path.join(workDir, 'batch.npz'))
+
+        sent = time.time()
+
+        with open(os.path.join(workDir, 'output.txt'), 'w') as output:
+            process = subprocess.run([sys.executable, 'runAnalysis.py'], cwd=workDir, stdout=output, stderr=subprocess.STDOUT)
+        ran = time.time()
+
+        shutil.copy(os.path.join(workDir, 'output.txt'), BatchOutputPath(batchNo))
+        if process.returncode != 0:
+            raise BatchError(batchNo, "runAnalysis.py failed, see " + BatchOutputPath(batchNo))
+        shutil.copy(os.path.join(workDir, 'elementresult.npz'), BatchResultPath(batchNo) + '.' + str(os.getpid()))
+        os.replace(BatchResultPath(batchNo) + '.' + str(os.getpid()), BatchResultPath(batchNo))
+        if os.path.exists(os.path.join(workDir, WORKER_METRICS)):
+            shutil.copy(os.path.join(workDir, WORKER_METRICS), BatchMetricsPath(batchNo))
+    except BatchError:
+        raise
+    except Exception as error:                                                 # i.e. missing result file, reported against the batch
+        raise BatchError(batchNo, repr(error))
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    return batchNo, started, {'send_s': sent - started, 'run_s': ran - sent, 'download_s': time.time() - ran}
+
+
+BACKENDS = {GolemBackend.name: GolemBackend, LocalBackend.name: LocalBackend}
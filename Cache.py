@@ -0,0 +1,77 @@
+""" Content addressed cache of element results, so unchanged elements aren't re-dispatched between runs."""
+import hashlib
+import os
+import numpy as np
+
+
+def PluginHash(type):
+    """Hash of every file in the element type folder, so any change to the plug-in code invalidates its cached results."""
+    digest = hashlib.sha256()
+    for file in sorted(os.listdir(type)):
+        path = os.path.join(type, file)
+        if os.path.isfile(path):                                                # Skips i.e. __pycache__
+            digest.update(file.encode())
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Element fields stored as ./cache/<key>.npy, key = hash of element type, element row, physics values & grid.
+    Size is limited to maxBytes, least recently used entries are evicted first (file mtime is updated on every hit).
+    """
+
+    def __init__(self, directory='./cache', maxBytes=1e9):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def Key(self, pluginHash, element, physics, grid):
+        """Cache key for a single element row (xPos, yPos, zPos, ElementAmplitude, ElementPhaseWeight)."""
+        digest = hashlib.sha256(pluginHash.encode())
+        for values in (element, physics, grid.theta, grid.phi):
+            digest.update(np.ascontiguousarray(values, dtype=float).tobytes())
+
+        return digest.hexdigest()
+
+    def Path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def Missing(self, keys):
+        """Returns indices of keys not in cache, counting hits/misses and marking hits as recently used."""
+        missing = []
+        for index, key in enumerate(keys):
+            if os.path.exists(self.Path(key)):
+                self.hits += 1
+                os.utime(self.Path(key))
+            else:
+                self.misses += 1
+                missing.append(index)
+
+        return missing
+
+    def Get(self, key):
+        """Returns memory mapped element field for key."""
+        return np.load(self.Path(key), mmap_mode='r')
+
+    def Put(self, key, field):
+        np.save(self.Path(key), field)
+
+    def Evict(self):
+        """Removes least recently used entries until cache is within maxBytes."""
+        entries = [os.path.join(self.directory, file) for file in os.listdir(self.directory) if file.endswith('.npy')]
+        entries = sorted(entries, key=os.path.getmtime)
+        totalBytes = sum(os.path.getsize(path) for path in entries)
+
+        for path in entries:
+            if totalBytes <= self.maxBytes:
+                break
+            totalBytes -= os.path.getsize(path)
+            os.remove(path)
+
+    def Summary(self):
+        return "Cache: " + str(self.hits) + " hits, " + str(self.misses) + " misses"
@@ -0,0 +1,102 @@
+""" Lazily evaluated far field of an array of identical elements - only the directions asked for are computed."""
+import importlib
+import os
+import sys
+import numpy as np
+import ArrayPattern
+from Adaptive import Evaluate, GridFunction
+
+POINT_SOLVER = 'pointAnalysis'                                                  # Optional plug-in module, see LoadPointSolver
+
+
+def LoadPointSolver(type):
+    """
+    FieldPoints(element, Freqs, physics, ThetaDeg, PhiDeg) -> field[freq, ...] from the element type folder's pointAnalysis.py,
+    None if the plug-in doesn't have one. Plug-ins are flat imports sharing module names (i.e. ArrayFactor), so the plug-in's
+    modules are imported fresh and removed from sys.modules again afterwards.
+    """
+    path = os.path.abspath(type)
+    if not os.path.exists(os.path.join(path, POINT_SOLVER + '.py')):
+        return None
+
+    names = [os.path.splitext(file)[0] for file in os.listdir(path) if file.endswith('.py')]
+    saved = {name: sys.modules.pop(name) for name in names if name in sys.modules}
+    sys.path.insert(0, path)
+    try:
+        return importlib.import_module(POINT_SOLVER).FieldPoints
+    finally:
+        sys.path.remove(path)
+        for name in names:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+
+
+class FarField:
+    """
+    Array pattern = element pattern x array factor (pattern multiplication), evaluated on demand at any (theta, phi) in degrees.
+    elementFunction(thetaDeg, phiDeg) -> complex pattern of the reference element (see ArrayPattern.ReferenceElement) at matching
+    flat arrays of directions, i.e. a plug-in point solver or FromGrid of a solved element.
+    Element pattern values are memoized per direction, so repeated cuts/points and re-weighted copies (see Reweighted) only pay for
+    the array factor. Element = xPos, yPos, zPos, ElementAmplitude, ElementPhaseWeight
+    """
+
+    def __init__(self, elementFunction, ElementArray, Freq, samples=None):
+        self.elementFunction = elementFunction
+        self.ElementArray = np.atleast_2d(ElementArray)
+        self.Freq = Freq
+        self.samples = samples if samples is not None else {}                  # (theta, phi) -> element pattern, see Adaptive.Evaluate
+
+    @classmethod
+    def FromGrid(cls, elementField, grid, ElementArray, Freq):
+        """Far field of the reference element solved over grid (elementField[phi][theta]), interpolated between grid points."""
+        return cls(GridFunction(elementField, grid), ElementArray, Freq)
+
+    @classmethod
+    def FromPlugin(cls, type, physics, ElementArray, Freq):
+        """
+        Far field with the reference element solved by the element type's point solver (see LoadPointSolver) at only the directions
+        asked for, so no grid is solved. physics as physics.csv, i.e. freq, W, L, h, Er, ... Raises ValueError if type has no point solver.
+        """
+        solver = LoadPointSolver(type)
+        if solver is None:
+            raise ValueError("Element type " + type + " has no " + POINT_SOLVER + ".py point solver")
+        reference = ArrayPattern.ReferenceElement()[0]
+
+        def ElementFunction(thetaDeg, phiDeg):
+            return solver(reference, [Freq], physics, thetaDeg, phiDeg)[0]
+
+        return cls(ElementFunction, ElementArray, Freq)
+
+    def __call__(self, thetaDeg, phiDeg):
+        """Complex field at each direction, thetaDeg & phiDeg broadcast together (scalars or arrays of any shape)."""
+        thetaDeg, phiDeg = np.broadcast_arrays(np.asarray(thetaDeg, dtype=float), np.asarray(phiDeg, dtype=float))
+        theta = thetaDeg.ravel()
+        phi = phiDeg.ravel()
+
+        elementPattern = Evaluate(self.elementFunction, self.samples, theta, phi)
+        arrayFactor = ArrayPattern.ArrayFactorPoints(self.ElementArray, self.Freq, theta, phi)
+
+        return (elementPattern * arrayFactor).reshape(thetaDeg.shape)
+
+    def Point(self, thetaDeg, phiDeg):
+        """Complex field in a single direction, i.e. boresight or a link direction."""
+        return complex(self(thetaDeg, phiDeg))
+
+    def Cut(self, phiDeg, thetaDeg=np.arange(0, 90, 0.1)):
+        """
+        Principal plane cut through boresight, as PatternMetrics.PlaneCut: phi = phiDeg plane continuing into the phi + 180° half plane.
+        Returns (angles, field) where angles are signed theta (degrees), negative on the phi + 180° side.
+        """
+        thetaDeg = np.asarray(thetaDeg, dtype=float)
+        angles = np.concatenate((-thetaDeg[:0:-1], thetaDeg))                    # theta = 0 only included once
+        phi = np.where(angles < 0, (phiDeg + 180) % 360, phiDeg)
+
+        return angles, self(np.abs(angles), phi)
+
+    def Reweighted(self, ElementArray):
+        """Same element pattern (sharing memoized values) with new element positions/weights, i.e. a steered or tapered array."""
+        return FarField(self.elementFunction, ElementArray, self.Freq, self.samples)
+
+    def __len__(self):
+        """Number of memoized element pattern directions."""
+        return len(self.samples)
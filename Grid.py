@@ -0,0 +1,63 @@
+""" Angular grid (theta/phi sample points) shared by the requestor, element workers and plotting."""
+import numpy as np
+
+
+def ThetaRange(ThetaStop, ThetaStep):
+    """Theta samples [0, ThetaStop) in ThetaStep steps, plus 180° (the back pole) when ThetaStop reaches it, so full sphere grids cover both poles."""
+    theta = np.arange(0, min(ThetaStop, 180), ThetaStep)
+    if ThetaStop >= 180:
+        theta = np.append(theta, 180)
+
+    return theta
+
+
+class AngularGrid:
+    """
+    Theta & phi sample vectors in degrees. Vectors can be non-uniform, i.e. fine steps near boresight, coarse elsewhere.
+    Fields computed over the grid are stored as fields[phiIndex][thetaIndex], so shape = (len(phi), len(theta)).
+    Ranges are half open, [0, thetaStop) & [0, phiStop), matching the original range(90) x range(360) layout, except a theta range
+    reaching the back pole (thetaStop 180°, the full sphere) which includes theta = 180°.
+    """
+
+    def __init__(self, theta, phi):
+        self.theta = np.unique(np.asarray(theta, dtype=float))                 # Sorted, duplicate free
+        self.phi = np.unique(np.asarray(phi, dtype=float))
+
+    @classmethod
+    def Uniform(cls, ThetaStop=90, PhiStop=360, ThetaStep=1, PhiStep=1):
+        """Uniformly spaced grid, defaults give the original 1° 90 x 360 grid."""
+        return cls(ThetaRange(ThetaStop, ThetaStep), np.arange(0, PhiStop, PhiStep))
+
+    @classmethod
+    def Refined(cls, ThetaStop=90, PhiStop=360, ThetaStep=1, PhiStep=1, FineThetaStop=10, FineThetaStep=0.1):
+        """Uniform grid with theta resampled at FineThetaStep between boresight and FineThetaStop, e.g. for sidelobe work."""
+        fineTheta = np.arange(0, FineThetaStop, FineThetaStep)
+        coarseTheta = ThetaRange(ThetaStop, ThetaStep)
+        coarseTheta = coarseTheta[coarseTheta >= FineThetaStop]
+        return cls(np.concatenate((fineTheta, coarseTheta)), np.arange(0, PhiStop, PhiStep))
+
+    @classmethod
+    def Load(cls, path):
+        """Loads grid saved with Save."""
+        data = np.load(path)
+        return cls(data['theta'], data['phi'])
+
+    def Save(self, path):
+        """Saves grid as npz with theta and phi vectors, this is the file element workers read."""
+        np.savez(path, theta=self.theta, phi=self.phi)
+
+    @property
+    def shape(self):
+        return (len(self.phi), len(self.theta))
+
+    @property
+    def size(self):
+        return len(self.phi) * len(self.theta)
+
+    def PhiIndex(self, phiDeg):
+        """Index of phi sample closest to phiDeg, used for extracting cuts, i.e. E-plane (phi=0°) or H-plane (phi=90°)."""
+        return int(np.argmin(np.abs(self.phi - phiDeg)))
+
+    def __repr__(self):
+        return "AngularGrid(theta: {} points {}°-{}°, phi: {} points {}°-{}°)".format(
+            len(self.theta), self.theta[0], self.theta[-1], len(self.phi), self.phi[0], self.phi[-1])
@@ -1,56 +1,88 @@
 import numpy as np
 import math
 import ArrayFactor
-from ArrayFactor import CalculateRelativePhase
-from math import cos, sin, sqrt, atan2, acos
+from ArrayFactor import RelativePathLengthArray
 
-def sph2cart1(r, th, phi):
-  x = r * cos(phi) * sin(th)
-  y = r * sin(phi) * sin(th)
-  z = r * cos(th)
+DEFAULT_Q = 28                                                                  # cos q(theta) exponent when physics.csv doesn't give one
+
+
+def sph2cartArray(r, th, phi):
+  x = r * np.cos(phi) * np.sin(th)
+  y = r * np.sin(phi) * np.sin(th)
+  z = r * np.cos(th)
 
   return x, y, z
 
 
-def cart2sph1(x, y, z):
-  r = sqrt(x**2 + y**2 + z**2) + 1e-15
-  th = acos(z / r)
-  phi = atan2(y, x)
+def cart2sphArray(x, y, z):
+  r = np.sqrt(x**2 + y**2 + z**2) + 1e-15
+  th = np.arccos(np.clip(z / r, -1, 1))
+  phi = np.arctan2(y, x)
 
   return r, th, phi
 
-def FieldSumHorn(element, Freq):
+
+def HornPattern(thetaLocal, phiLocal, qE=DEFAULT_Q, qH=None):
+    """
+    Horn pattern estimate using a cos q(theta) function, theta & phi (radians) numpy arrays of any (matching) shape.
+    The exponent blends from qE in the E-plane (phi = 0°, E-field parallel to x-axis) to qH in the H-plane (phi = 90°):
+    q(phi) = qE cos^2(phi) + qH sin^2(phi), qH defaults to qE (rotationally symmetric).
+    No radiation is assumed behind the aperture plane (theta > 90°) for simplification, as in the original model.
+    """
+    if qH is None:
+        qH = qE
+    cosTheta = np.cos(thetaLocal)
+    q = qE * np.cos(phiLocal) ** 2 + qH * np.sin(phiLocal) ** 2
+
+    return np.where(cosTheta >= 0, np.abs(cosTheta) ** q, 0)
+
+
+def FieldSumHorn(element, Freq, ThetaDeg=None, PhiDeg=None, qE=DEFAULT_Q, qH=None):
     """
-    Summation of field contributions from each horn element in array, at frequency freq for theta 0°-95°, phi 0°-360°.
-    Horn pattern estimate using cos q(theta) function.
+    Summation of field contributions from each horn element in array, at frequency freq over the ThetaDeg x PhiDeg grid.
+    ThetaDeg & PhiDeg are vectors in degrees (can be non-uniform, theta up to 180° for full sphere), default to theta 0°-89°, phi 0°-359°.
+    Horn pattern estimate using cos q(theta) function, see HornPattern.
     Element = xPos, yPos, zPos, ElementAmplitude, ElementPhaseWeight
-    Returns arrayFactor[theta, phi, elementSum]
+    Returns arrayFactor[phi, theta] = elementSum
     """
-    arrayFactor = np.full((360, 90), 1e-9 + 0j)
+    return FieldSumHornFreqs(element, [Freq], ThetaDeg, PhiDeg, qE, qH)[0]
+
 
-    Lambda = 3e8 / Freq
+def FieldSumHornFreqs(element, Freqs, ThetaDeg=None, PhiDeg=None, qE=DEFAULT_Q, qH=None):
+    """
+    FieldSumHorn for each frequency in Freqs, the whole theta/phi grid is evaluated in one pass using numpy arrays.
+    Returns arrayFactor[freq, phi, theta] = elementSum
+    """
+    if ThetaDeg is None:
+        ThetaDeg = np.arange(90)
+    if PhiDeg is None:
+        PhiDeg = np.arange(360)
 
-    for theta in range(90):
-        for phi in range(360):                                                                                                      # For all theta/phi positions
-            elementSum = 1e-9 + 0j
+    thetaDeg, phiDeg = np.meshgrid(ThetaDeg, PhiDeg)                                                                                # Grids of form [phi][theta]
 
-            xff, yff, zff = sph2cart1(999, math.radians(theta), math.radians(phi))                                                  # Find point in far field
+    return FieldSumHornPoints(element, Freqs, thetaDeg, phiDeg, qE, qH)
 
-            if theta > 90:
-                hornFunction = 0                                                                                                # Assume no radiation behind horn for simplification
-            else:
-                xlocal = xff - element[0]                                                                                       # Calculate local position in cartesian
-                ylocal = yff - element[1]
-                zlocal = zff - element[2]
 
-                r, thetaLocal, phiLocal = cart2sph1(xlocal, ylocal, zlocal)                                                     # Convert local position to spherical
+def FieldSumHornPoints(element, Freqs, ThetaDeg, PhiDeg, qE=DEFAULT_Q, qH=None):
+    """
+    FieldSumHornFreqs at scattered points, ThetaDeg & PhiDeg are matching arrays of any shape (degrees) paired point by point,
+    i.e. the sample points of an adaptive refinement.
+    The horn pattern & path lengths don't depend on frequency so are calculated once, only the phase is per frequency.
+    Returns arrayFactor[freq, ...] = elementSum with the shape of ThetaDeg after the frequency axis
+    """
+    theta = np.radians(ThetaDeg)
+    phi = np.radians(PhiDeg)
+
+    xff, yff, zff = sph2cartArray(999, theta, phi)                                                                                  # Find points in far field
 
-                hornFunction = math.cos(thetaLocal) ** 28                                                                       # Horn q function, q = 28
+    r, thetaLocal, phiLocal = cart2sphArray(xff - element[0], yff - element[1], zff - element[2])                                  # Local position converted to spherical
 
-            if hornFunction != 0:                                                                                               # Sum each elements contribution
-                relativePhase = CalculateRelativePhase(element, Lambda, math.radians(theta), math.radians(phi))                 # Find relative phase for current element
-                elementSum += element[3] * hornFunction * math.e ** ((relativePhase + element[4]) * 1j)                         # Element contribution = Amp * e^j(Phase + Phase Weight)
+    hornFunction = HornPattern(thetaLocal, phiLocal, qE, qH)
+    pathLength = RelativePathLengthArray(element, theta, phi)
 
-            arrayFactor[phi][theta] = elementSum.real
+    arrayFactor = np.empty((len(Freqs),) + np.shape(theta), dtype=complex)
+    for freqNo, Freq in enumerate(Freqs):
+        relativePhase = (2 * math.pi * Freq / 3e8) * pathLength                                                                     # Relative phase for current element
+        arrayFactor[freqNo] = 1e-9 + element[3] * hornFunction * np.exp((relativePhase + element[4]) * 1j)                          # Element contribution = Amp * e^j(Phase + Phase Weight)
 
     return arrayFactor
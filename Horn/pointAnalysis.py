@@ -0,0 +1,11 @@
+import Horn
+from Horn import FieldSumHornPoints, DEFAULT_Q
+
+
+def FieldPoints(element, Freqs, physics, ThetaDeg, PhiDeg):
+    """
+    Element field at scattered directions, for evaluating a pattern on demand without a grid solve (see FarField.FromPlugin).
+    physics as physics.csv: freq, W, L, h, Er, qE, qH. Returns field[freq, ...] with the shape of ThetaDeg after the frequency axis
+    """
+    qE, qH = physics[5:7] if len(physics) >= 7 else (DEFAULT_Q, DEFAULT_Q)      # E/H-plane cos q(theta) exponents
+    return FieldSumHornPoints(element, Freqs, ThetaDeg, PhiDeg, qE, qH)
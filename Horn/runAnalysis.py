@@ -1,11 +1,24 @@
 import Horn
-from Horn import FieldSumHorn
+from Horn import FieldSumHornFreqs, DEFAULT_Q
+import json
+import resource
+import time
 import numpy as np
 
 print("STARTING")
-elementField = np.empty((1, 360, 90))
-element = np.genfromtxt('element.csv', delimiter=',')
+started = time.time()
+batch = np.load('batch.npz')                                                    # Elements (rows) for this task and their index in array
 physics = np.genfromtxt('physics.csv', delimiter=',')
-elementField[0] = FieldSumHorn(element, physics[0])
-np.savetxt('elementresult.csv', elementField[0], delimiter=',')
+freqs = np.atleast_1d(np.genfromtxt('frequencies.csv', delimiter=','))          # Frequencies to solve at, physics[0] is the first
+grid = np.load('grid.npz')                                                      # theta/phi vectors (degrees) to solve over
+qE, qH = physics[5:7] if len(physics) >= 7 else (DEFAULT_Q, DEFAULT_Q)          # E/H-plane cos q(theta) exponents
+elementField = np.empty((len(batch['elements']), len(freqs), len(grid['phi']), len(grid['theta'])), dtype=np.complex64)
+for batchNo, element in enumerate(batch['elements']):
+    elementField[batchNo] = FieldSumHornFreqs(element, freqs, grid['theta'], grid['phi'], qE, qH)
+# Binary complex result with header, see Results.py
+np.savez('elementresult.npz', field=elementField, theta=grid['theta'], phi=grid['phi'], freq=freqs, element=batch['indices'])
+# Solve time, peak memory & points computed, see TaskMetrics.py
+with open('metrics.json', 'w') as f:
+    json.dump({'solve_s': time.time() - started, 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+               'points': elementField.size, 'elements': len(elementField)}, f)
 print("DONE")
@@ -0,0 +1,176 @@
+""" Element layouts (positions) and amplitude tapers, built as whole arrays so 10k+ element layouts take milliseconds."""
+import os
+import numpy as np
+from ArrayPattern import STANDARD_COLUMNS
+
+"""
+Layouts return ElementArray rows: xPos, yPos, zPos, ElementAmplitude, ElementPhaseWeight, centred on the origin in the z = 0 plane
+with unit amplitude & no phase weight. Tapers (TAPERS) set the amplitudes of any layout.
+The whole array is saved as one table, ./elements/array.csv (see SaveTable), batches for tasks are then sliced from it.
+"""
+ARRAY_TABLE_PATH = './elements/array.csv'
+KEY_DECIMALS = 9                                                                # Positions are rounded to this before finding the distinct rows/columns/rings
+
+
+def Elements(x, y, z=0):
+    """ElementArray from position vectors, unit amplitude & no phase weight."""
+    x, y, z = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(z, dtype=float))
+    ElementArray = np.zeros((x.size, STANDARD_COLUMNS))
+    ElementArray[:, 0] = x.ravel()
+    ElementArray[:, 1] = y.ravel()
+    ElementArray[:, 2] = z.ravel()
+    ElementArray[:, 3] = 1
+
+    return ElementArray
+
+
+def Centred(count, spacing):
+    """count positions spacing apart, centred on 0."""
+    return (np.arange(count) - (count - 1) / 2) * spacing
+
+
+def Rectangular(X_Elements, Y_Elements, spacing, ySpacing=None):
+    """X x Y grid, x varying fastest (the original GenerateElementArray order). ySpacing defaults to spacing."""
+    x, y = np.meshgrid(Centred(X_Elements, spacing), Centred(Y_Elements, spacing if ySpacing is None else ySpacing))
+    return Elements(x, y)
+
+
+def Triangular(X_Elements, Y_Elements, spacing):
+    """
+    Triangular (hexagonal) lattice, X elements per row & Y rows, every element spacing from its six neighbours.
+    Rows are spacing x sqrt(3)/2 apart, every other row shifted by spacing / 2.
+    """
+    x, y = np.meshgrid(Centred(X_Elements, spacing), Centred(Y_Elements, spacing * np.sqrt(3) / 2))
+    x = x + (np.arange(Y_Elements)[:, np.newaxis] % 2 - (Y_Elements > 1) / 2) * spacing / 2
+    return Elements(x, y)
+
+
+def Circular(noRings, spacing, centre=True):
+    """
+    Concentric rings spacing apart (ring k has radius k x spacing), each with as many elements as fit spacing apart around it,
+    the first element of each ring on the x axis. centre adds an element at the origin.
+    """
+    ringNos = np.arange(1, noRings + 1)
+    counts = np.maximum(1, np.floor(2 * np.pi * ringNos)).astype(int)           # Circumference / spacing
+    ring = np.repeat(ringNos, counts)
+    position = np.arange(len(ring)) - np.repeat(np.cumsum(counts) - counts, counts)
+    angle = 2 * np.pi * position / np.repeat(counts, counts)
+    radius = ring * spacing
+    x = radius * np.cos(angle)
+    y = radius * np.sin(angle)
+    if centre:
+        x = np.concatenate(([0], x))
+        y = np.concatenate(([0], y))
+
+    return Elements(x, y)
+
+
+def Load(path):
+    """
+    User supplied layout from a .npy or .csv (comma separated, '#' comments) file, one row per element.
+    Rows hold at least x, y. Missing z, amplitude & phase columns default to 0, 1 & 0, extra columns (i.e. element type) are kept.
+    """
+    if os.path.splitext(path)[1] == '.npy':
+        rows = np.load(path)
+    else:
+        rows = np.loadtxt(path, delimiter=',', ndmin=2)
+    rows = np.atleast_2d(np.asarray(rows, dtype=float))
+    if rows.shape[1] < 2:
+        raise ValueError("Layout file " + path + " needs at least x, y columns")
+
+    ElementArray = Elements(rows[:, 0], rows[:, 1])
+    ElementArray = np.hstack((ElementArray, np.zeros((len(rows), max(0, rows.shape[1] - STANDARD_COLUMNS)))))
+    ElementArray[:, 2:rows.shape[1]] = rows[:, 2:]
+
+    return ElementArray
+
+
+def Taylor(u, SidelobeDb=-30, nbar=4):
+    """
+    Taylor n-bar line source amplitude at normalised aperture positions u (-0.5 to 0.5), peak normalised to 1.
+    Sidelobes near the main beam are held at SidelobeDb, the following ones fall away as for a uniform aperture.
+    """
+    B = 10 ** (abs(SidelobeDb) / 20)
+    A = np.arccosh(B) / np.pi
+    sigma2 = nbar ** 2 / (A ** 2 + (nbar - 0.5) ** 2)
+    m = np.arange(1, nbar)
+
+    numerator = np.prod(1 - m[:, np.newaxis] ** 2 / sigma2 / (A ** 2 + (m[np.newaxis, :] - 0.5) ** 2), axis=1)
+    others = np.where(m[:, np.newaxis] != m[np.newaxis, :], 1 - m[:, np.newaxis] ** 2 / m[np.newaxis, :] ** 2, 1)
+    F = (-1) ** (m + 1) * numerator / (2 * np.prod(others, axis=1))
+
+    weights = 1 + 2 * np.dot(np.cos(2 * np.pi * np.multiply.outer(np.asarray(u, dtype=float), m)), F)
+    return weights / (1 + 2 * np.sum(F))                                       # Peak is at the centre
+
+
+def Chebyshev(u, SidelobeDb=-30):
+    """
+    Dolph-Chebyshev amplitude at normalised aperture positions u (-0.5 to 0.5), peak normalised to 1: all sidelobes at SidelobeDb.
+    Weights are exact for N uniformly spaced positions (n - (N - 1) / 2) / N, N = distinct values of u, linearly interpolated otherwise.
+    """
+    u = np.asarray(u, dtype=float)
+    N = len(np.unique(np.round(u, KEY_DECIMALS)))
+    if N < 2:
+        return np.ones_like(u)
+
+    # Weights are the inverse DFT of the Chebyshev polynomial sampled at the N pattern nulls & peaks
+    order = N - 1
+    beta = np.cosh(np.arccosh(10 ** (abs(SidelobeDb) / 20)) / order)
+    x = beta * np.cos(np.pi * np.arange(N) / N)
+    p = np.empty(N)
+    outside = np.abs(x) > 1
+    p[outside] = np.sign(x[outside]) ** order * np.cosh(order * np.arccosh(np.abs(x[outside])))
+    p[~outside] = np.cos(order * np.arccos(x[~outside]))
+    if N % 2:
+        w = np.real(np.fft.fft(p))[:(N + 1) // 2]
+        w = np.concatenate((w[:0:-1], w))
+    else:
+        w = np.real(np.fft.fft(p * np.exp(1j * np.pi * np.arange(N) / N)))[1:N // 2 + 1]
+        w = np.concatenate((w[::-1], w))
+
+    return np.interp(u, (np.arange(N) - (N - 1) / 2) / N, w / np.max(w))
+
+
+def Uniform(u, SidelobeDb=None):
+    return np.ones_like(np.asarray(u, dtype=float))
+
+
+TAPERS = {'uniform': Uniform, 'taylor': Taylor, 'chebyshev': Chebyshev}
+
+
+def NormalisedPositions(values):
+    """
+    Positions mapped to -0.5 to 0.5 of the aperture, taking the aperture as N x the mean spacing of the N distinct positions,
+    so uniformly spaced positions map to (n - (N - 1) / 2) / N as the discrete tapers expect.
+    """
+    N = len(np.unique(np.round(values, KEY_DECIMALS)))
+    span = np.ptp(values)
+    if N < 2 or span == 0:
+        return np.zeros_like(values)
+
+    return (values - (np.max(values) + np.min(values)) / 2) / (span * N / (N - 1))
+
+
+def ApplyTaper(ElementArray, taper, SidelobeDb=-30, radial=False):
+    """
+    Returns a copy of ElementArray with amplitudes set by taper (a TAPERS name), peak amplitude 1.
+    Planar layouts are tapered separably, taper(x) x taper(y). radial tapers by distance from the centre instead,
+    i.e. for Circular layouts, as a line taper across the diameter.
+    """
+    function = TAPERS[taper]
+    ElementArray = np.array(ElementArray, dtype=float)
+
+    if radial:
+        radius = np.hypot(ElementArray[:, 0] - np.mean(ElementArray[:, 0]), ElementArray[:, 1] - np.mean(ElementArray[:, 1]))
+        diameter = NormalisedPositions(np.concatenate((-radius, radius)))       # Both sides of the centre, as a line through it
+        amplitude = function(diameter, SidelobeDb)[len(radius):]
+    else:
+        amplitude = function(NormalisedPositions(ElementArray[:, 0]), SidelobeDb) * function(NormalisedPositions(ElementArray[:, 1]), SidelobeDb)
+
+    ElementArray[:, 3] = amplitude / np.max(amplitude)
+    return ElementArray
+
+
+def SaveTable(ElementArray, path=ARRAY_TABLE_PATH):
+    """Saves the whole array as one csv table, a row per element, replacing the old one file per element layout."""
+    np.savetxt(path, ElementArray, delimiter=',', header='xPos,yPos,zPos,ElementAmplitude,ElementPhaseWeight')
@@ -2,29 +2,63 @@ import numpy as np
 import math
 import RectPatch
 
-def ArrayFactor(ElementArray, Freq):
+MAX_CHUNK_BYTES = 64e6                                                                                                              # Memory bound for the complex steering matrix of one chunk of angles
+
+
+def ArrayFactor(ElementArray, Freq, ThetaDeg=None, PhiDeg=None, MaxChunkBytes=MAX_CHUNK_BYTES):
     """
-    Summation of field contributions from each element in array, at frequency freq at theta 0°-95°, phi 0°-360°.
+    Summation of field contributions from each element in array, at frequency freq over the ThetaDeg x PhiDeg grid.
+    ThetaDeg & PhiDeg are vectors in degrees (can be non-uniform), default to theta 0°-89°, phi 0°-359° in 1° steps.
     Element = xPos, yPos, zPos, ElementAmplitude, ElementPhaseWeight
-    Returns arrayFactor[theta, phi, elementSum]
+    Returns arrayFactor[phi, theta] = abs(elementSum)
     """
+    if ThetaDeg is None:
+        ThetaDeg = np.arange(90)
+    if PhiDeg is None:
+        PhiDeg = np.arange(360)
+
+    theta, phi = np.meshgrid(np.radians(ThetaDeg), np.radians(PhiDeg))                                                              # Grids of form [phi][theta]
 
-    arrayFactor = np.ones((360, 90))
+    elementSum = ArrayFactorComplex(ElementArray, Freq, theta.ravel(), phi.ravel(), MaxChunkBytes)
+
+    arrayFactor = np.abs(elementSum).reshape(theta.shape)
+
+    return arrayFactor
+
+
+def ArrayFactorComplex(ElementArray, Freq, theta, phi, MaxChunkBytes=MAX_CHUNK_BYTES):
+    """
+    Complex summation of each elements contribution for flat arrays of theta & phi (radians).
+    The sum over elements is a matrix-vector product: steering matrix e^j(k.r) [angles x elements] x weights Amp * e^j(Phase Weight).
+    Angles are processed in chunks so the steering matrix never exceeds MaxChunkBytes, which keeps memory bounded for large arrays.
+    Element = xPos, yPos, zPos, ElementAmplitude, ElementPhaseWeight
+    Returns elementSum[angle]
+    """
+    ElementArray = np.atleast_2d(ElementArray)
 
     Lambda = 3e8 / Freq
+    phaseConstant = (2 * math.pi / Lambda)
 
-    for theta in range(90):
-        for phi in range(360):                                                                                                      # For all theta/phi positions
-            elementSum = 1e-9 + 0j
+    directions = DirectionCosines(theta, phi)                                                                                       # [angle][x, y, z] unit vectors, built once
+    positions = phaseConstant * ElementArray[:, 0:3]                                                                                # k * element position
+    weights = ElementArray[:, 3] * np.exp(ElementArray[:, 4] * 1j)                                                                  # Amp * e^j(Phase Weight)
 
-            for element in ElementArray:                                                                                            # Summation of each elements contribution at theta/phi position.
-                relativePhase = CalculateRelativePhase(element, Lambda, math.radians(theta), math.radians(phi))                     # Find relative phase for current element
-                elementSum += element[3] * math.e ** ((relativePhase + element[4]) * 1j)                                            # Element contribution = Amp * e^j(Phase + Phase Weight)
+    elementSum = np.full(len(directions), 1e-9 + 0j)
 
-            arrayFactor[phi][theta] = abs(elementSum)
-            #arrayFactor[phi][theta] = elementSum.real
+    chunkSize = max(1, int(MaxChunkBytes // (16 * len(ElementArray))))                                                             # complex128 = 16 bytes per steering term
+    for start in range(0, len(directions), chunkSize):
+        stop = start + chunkSize
+        steering = np.exp(np.dot(directions[start:stop], positions.T) * 1j)                                                         # Relative phase of every element at every angle in chunk
+        elementSum[start:stop] += np.dot(steering, weights)
 
-    return arrayFactor
+    return elementSum
+
+
+def DirectionCosines(theta, phi):
+    """
+    Returns unit direction vectors [angle][x, y, z] for flat arrays of theta & phi (radians).
+    """
+    return np.column_stack((np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)))
 
 
 def CalculateRelativePhase(Element, Lambda, theta, phi):
@@ -43,3 +77,15 @@ def CalculateRelativePhase(Element, Lambda, theta, phi):
     phaseOfIncidentWaveAtElement = phaseConstant * (xVector + yVector + zVector)
 
     return phaseOfIncidentWaveAtElement
+
+
+def RelativePathLengthArray(Element, theta, phi):
+    """
+    Array version of CalculateRelativePhase without the phase constant, path length of plane wave at element referred to origin (m).
+    Relative phase = 2 * pi / Lambda * path length, so it can be calculated once for many frequencies.
+    """
+    xVector = Element[0] * np.sin(theta) * np.cos(phi)
+    yVector = Element[1] * np.sin(theta) * np.sin(phi)
+    zVector = Element[2] * np.cos(theta)
+
+    return xVector + yVector + zVector
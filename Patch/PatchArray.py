@@ -1,41 +1,65 @@
 import numpy as np
 import math
 import RectPatch
-from RectPatch import PatchFunction, cart2sph1, sph2cart1
+from RectPatch import PatchGeometry, PatchFunctionGeometry, GetPatchModel, cart2sphArray, sph2cartArray
 import ArrayFactor
-from ArrayFactor import CalculateRelativePhase
+from ArrayFactor import RelativePathLengthArray
 
 
-def FieldSumPatchElement(element, Freq, W, L, h, Er):
+def FieldSumPatchElement(element, Freq, W, L, h, Er, ThetaDeg=None, PhiDeg=None):
     """
-    Summation of field contributions from each patch element in array, at frequency freq for theta 0°-95°, phi 0°-360°.
+    Summation of field contributions from each patch element in array, at frequency freq over the ThetaDeg x PhiDeg grid.
+    ThetaDeg & PhiDeg are vectors in degrees (can be non-uniform), default to theta 0°-89°, phi 0°-359° in 1° steps.
+    The whole theta/phi grid is evaluated in one pass using numpy arrays.
     Element = xPos, yPos, zPos, ElementAmplitude, ElementPhaseWeight
-    Returns arrayFactor[theta, phi, elementSum]
+    Returns arrayFactor[phi, theta] = elementSum
     """
+    return FieldSumPatchElementFreqs(element, [Freq], W, L, h, Er, ThetaDeg, PhiDeg)[0]
 
-    arrayFactor = np.full((360, 90), 1e-9 + 0j)
 
-    Lambda = 3e8 / Freq
+def FieldSumPatchElementFreqs(element, Freqs, W, L, h, Er, ThetaDeg=None, PhiDeg=None):
+    """
+    FieldSumPatchElement for each frequency in Freqs.
+    Frequency independent geometry (far field points, local angles, patch model angles & path lengths) is calculated once and shared.
+    An element at the origin (i.e. the pattern multiplication reference element) uses the patch model's memoized grid, see PatchModel.
+    Returns arrayFactor[freq, phi, theta] = elementSum
+    """
+    if ThetaDeg is None:
+        ThetaDeg = np.arange(90)
+    if PhiDeg is None:
+        PhiDeg = np.arange(360)
+
+    if not np.any(element[:3]):                                                                                                     # Local angles = far field angles, no path length
+        patchFunctions = [GetPatchModel(Freq, W, L, h, Er).Grid(ThetaDeg, PhiDeg) for Freq in Freqs]
+        return np.array([1e-9 + element[3] * patchFunction * np.exp(element[4] * 1j) for patchFunction in patchFunctions])
+
+    thetaDeg, phiDeg = np.meshgrid(ThetaDeg, PhiDeg)                                                                                # Grids of form [phi][theta]
 
-    for theta in range(90):
-        for phi in range(360):                                                                                                      # For all theta/phi positions
-            elementSum = 1e-9 + 0j
+    return FieldSumPatchElementPoints(element, Freqs, W, L, h, Er, thetaDeg, phiDeg)
 
-            xff, yff, zff = sph2cart1(999, math.radians(theta), math.radians(phi))                                                  # Find point in far field
 
-            # find local theta/phi, calculate field contribution and add to summation for point
-            xlocal = xff - element[0]
-            ylocal = yff - element[1]                                                                                           # Calculate local position in cartesian
-            zlocal = zff - element[2]
+def FieldSumPatchElementPoints(element, Freqs, W, L, h, Er, ThetaDeg, PhiDeg):
+    """
+    FieldSumPatchElementFreqs at scattered points, ThetaDeg & PhiDeg are matching arrays of any shape (degrees) paired point by point,
+    i.e. the sample points of an adaptive refinement.
+    Returns arrayFactor[freq, ...] = elementSum with the shape of ThetaDeg after the frequency axis
+    """
+    theta = np.radians(ThetaDeg)
+    phi = np.radians(PhiDeg)
+
+    xff, yff, zff = sph2cartArray(999, theta, phi)                                                                                  # Find points in far field
 
-            r, thetaLocal, phiLocal = cart2sph1(xlocal, ylocal, zlocal)                                                         # Convert local position to spherical
+    # find local theta/phi, calculate field contribution and add to summation for each point
+    r, thetaLocal, phiLocal = cart2sphArray(xff - element[0], yff - element[1], zff - element[2])                                  # Local position converted to spherical
 
-            patchFunction = PatchFunction(math.degrees(thetaLocal), math.degrees(phiLocal), Freq, W, L, h, Er)            # Patch element pattern for local theta, phi
+    geometry = PatchGeometry(np.degrees(thetaLocal), np.degrees(phiLocal))                                                          # Patch model angles for local theta, phi
+    pathLength = RelativePathLengthArray(element, theta, phi)
 
-            if patchFunction != 0:                                                                                              # Sum each elements contribution
-                relativePhase = CalculateRelativePhase(element, Lambda, math.radians(theta), math.radians(phi))                 # Find relative phase for current element
-                elementSum += element[3] * patchFunction * math.e ** ((relativePhase + element[4]) * 1j)                        # Element contribution = Amp * e^j(Phase + Phase Weight)
+    arrayFactor = np.empty((len(Freqs),) + np.shape(theta), dtype=complex)
+    for freqNo, Freq in enumerate(Freqs):
+        patchFunction = PatchFunctionGeometry(geometry, Freq, W, L, h, Er)                                                          # Patch element pattern at freq
 
-            arrayFactor[phi][theta] = elementSum
+        relativePhase = (2 * math.pi * Freq / 3e8) * pathLength                                                                     # Relative phase for current element
+        arrayFactor[freqNo] = 1e-9 + element[3] * patchFunction * np.exp((relativePhase + element[4]) * 1j)                         # Element contribution = Amp * e^j(Phase + Phase Weight)
 
     return arrayFactor
@@ -1,8 +1,13 @@
 """ Functions dealing with rectangular patch antenna."""
 import math
 import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
 from math import cos, sin, sqrt, atan2, acos
 
+MAX_MODELS = 64                                                                 # Patch configurations (Freq, W, L, h, Er) kept by GetPatchModel
+MAX_GRIDS = 8                                                                   # Pattern grids memoized per PatchModel
+
 def PatchFunction(thetaInDeg, phiInDeg, Freq, W, L, h, Er):
     """
     Taken from Design_patchr
@@ -14,14 +19,13 @@ def PatchFunction(thetaInDeg, phiInDeg, Freq, W, L, h, Er):
     h......Substrate thickness (m)
     Er.....Dielectric constant of substrate
     Refrence C.A. Balanis 2nd Edition Page 745
+    Constants for the configuration are derived once, see PatchModel.
     """
-    lamba = 3e8 / Freq
+    model = GetPatchModel(Freq, W, L, h, Er)
 
     theta_in = math.radians(thetaInDeg)
     phi_in = math.radians(phiInDeg)
 
-    ko = 2 * math.pi / lamba
-
     xff, yff, zff = sph2cart1(999, theta_in, phi_in)                            # Rotate coords 90 deg about x-axis to match array_utils coord system with coord system used in the model.
     xffd = zff
     yffd = xff
@@ -36,16 +40,7 @@ def PatchFunction(thetaInDeg, phiInDeg, Freq, W, L, h, Er):
     if phi == 0:
         phi = 1e-9
 
-    Ereff = ((Er + 1) / 2) + ((Er - 1) / 2) * (1 + 12 * (h / W)) ** -0.5        # Calculate effictive dielectric constant for microstrip line of width W on dielectric material of constant Er
-
-    F1 = (Ereff + 0.3) * (W / h + 0.264)                                        # Calculate increase length dL of patch length L due to fringing fields at each end, giving total effective length Leff = L + 2*dL
-    F2 = (Ereff - 0.258) * (W / h + 0.8)
-    dL = h * 0.412 * (F1 / F2)
-
-    Leff = L + 2 * dL
-
-    Weff = W                                                                    # Calculate effective width Weff for patch, uses standard Er value.
-    heff = h * sqrt(Er)
+    ko, Leff, Weff, heff = model.ko, model.Leff, model.Weff, model.heff
 
     # Patch pattern function of theta and phi, note the theta and phi for the function are defined differently to theta_in and phi_in
     Numtr2 = sin(ko * heff * cos(phi) / 2)
@@ -67,10 +62,8 @@ def PatchFunction(thetaInDeg, phiInDeg, Freq, W, L, h, Er):
     F1 = 1 / (((rolloff_factor * (abs(theta_in_deg) - 90)) ** 2) + 0.001)       # intermediate calc
     PatEdgeSF = 1 / (F1 + 1)                                                    # Pattern scaling factor
 
-    UNF = 1.0006                                                                # Unity normalisation factor for element pattern
-
     if theta_in <= math.pi / 2:
-        Etot = Ftheta * Fphi * PatEdgeSF * UNF                                   # Total pattern by pattern multiplication
+        Etot = Ftheta * Fphi * PatEdgeSF * model.UNF                             # Total pattern by pattern multiplication
     else:
         Etot = 0
 
@@ -93,26 +86,144 @@ def cart2sph1(x, y, z):
   return r, th, phi
 
 
-def GetPatchFields(PhiStart, PhiStop, ThetaStart, ThetaStop, Freq, W, L, h, Er):
-    """"
-    Calculates the E-field for range of thetaStart-thetaStop and phiStart-phiStop
-    Returning a numpy array of form - fields[phiDeg][thetaDeg] = eField
+def PatchGeometry(thetaInDeg, phiInDeg):
+    """
+    Frequency independent part of the patch pattern (see PatchModel.Pattern) - angles in the patch model coord system and ground plane roll off.
+    Calculate once and pass to PatchFunctionGeometry for each frequency.
+    """
+    theta_in = np.radians(thetaInDeg)
+    phi_in = np.radians(phiInDeg)
+
+    xff, yff, zff = sph2cartArray(999, theta_in, phi_in)                       # Rotate coords 90 deg about x-axis, as in PatchFunction
+    r, theta, phi = cart2sphArray(zff, xff, yff)
+
+    theta = np.where(theta == 0, 1e-9, theta)                                   # Trap potential division by zero warning
+    phi = np.where(phi == 0, 1e-9, phi)
+
+    rolloff_factor = 0.5
+    theta_in_deg = theta_in * 180 / math.pi
+    F1 = 1 / (((rolloff_factor * (np.abs(theta_in_deg) - 90)) ** 2) + 0.001)
+    PatEdgeSF = 1 / (F1 + 1)
+
+    return {'sinTheta': np.sin(theta), 'cosTheta': np.cos(theta), 'sinPhi': np.sin(phi), 'cosPhi': np.cos(phi),
+            'PatEdgeSF': PatEdgeSF, 'front': theta_in <= math.pi / 2}
+
+
+def PatchFunctionGeometry(geometry, Freq, W, L, h, Er):
+    """
+    Frequency dependent part of the patch pattern, evaluated on angles from PatchGeometry.
+    """
+    return GetPatchModel(Freq, W, L, h, Er).PatternGeometry(geometry)
+
+
+class PatchModel:
+    """
+    Rectangular patch at one configuration, resonating in the (TMx 010) mode with E-field parallel to the x-axis (see PatchFunction).
+    Frequency & geometry constants (ko, Ereff, dL, Leff, Weff, heff) are derived once on creation, patterns are then evaluated
+    for whole arrays of angles. Pattern grids are memoized (up to MAX_GRIDS), so re-evaluating the same grid for the same patch,
+    i.e. the element pattern while sweeping array layouts, costs a lookup.
+    Use GetPatchModel to share models between calls with the same configuration.
+    Freq...Frequency (Hz)
     W......Width of patch (m)
     L......Length of patch (m)
     h......Substrate thickness (m)
     Er.....Dielectric constant of substrate
     """
-    fields = np.ones((PhiStop, ThetaStop))                                      # Create initial array to hold e-fields for each position
 
-    for phiDeg in range(PhiStart, PhiStop):
-            for thetaDeg in range(ThetaStart, ThetaStop):                       # Iterate over all Phi/Theta combinations
-                eField = PatchFunction(thetaDeg, phiDeg, Freq, W, L, h, Er)     # Calculate the field for current Phi, Theta
-                fields[phiDeg][thetaDeg] = eField                               # Update array with e-field
+    def __init__(self, Freq, W, L, h, Er):
+        self.config = (Freq, W, L, h, Er)
+
+        lamba = 3e8 / Freq
+        self.ko = 2 * math.pi / lamba
+
+        self.Ereff = ((Er + 1) / 2) + ((Er - 1) / 2) * (1 + 12 * (h / W)) ** -0.5      # Calculate effictive dielectric constant for microstrip line of width W on dielectric material of constant Er
 
-    return fields
+        F1 = (self.Ereff + 0.3) * (W / h + 0.264)                               # Calculate increase length dL of patch length L due to fringing fields at each end, giving total effective length Leff = L + 2*dL
+        F2 = (self.Ereff - 0.258) * (W / h + 0.8)
+        self.dL = h * 0.412 * (F1 / F2)
 
+        self.Leff = L + 2 * self.dL
 
+        self.Weff = W                                                           # Calculate effective width Weff for patch, uses standard Er value.
+        self.heff = h * sqrt(Er)
 
+        self.UNF = 1.0006                                                       # Unity normalisation factor for element pattern
+        self.grids = OrderedDict()                                              # (theta, phi bytes) -> fields[phi][theta], least recently used first
+
+    def Pattern(self, thetaInDeg, phiInDeg):
+        """Etot at each theta/phi pair (degrees), numpy arrays of any (matching) shape or scalars."""
+        return self.PatternGeometry(PatchGeometry(thetaInDeg, phiInDeg))
+
+    def PatternGeometry(self, geometry):
+        """Etot on angles from PatchGeometry, which can be shared between models (i.e. frequencies)."""
+        # Patch pattern function of theta and phi, note the theta and phi for the function are defined differently to theta_in and phi_in
+        Numtr2 = np.sin(self.ko * self.heff * geometry['cosPhi'] / 2)
+        Demtr2 = (self.ko * self.heff * geometry['cosPhi']) / 2
+        Fphi = (Numtr2 / Demtr2) * np.cos((self.ko * self.Leff / 2) * geometry['sinPhi'])
+
+        Numtr1 = np.sin((self.ko * self.heff / 2) * geometry['sinTheta'])
+        Demtr1 = ((self.ko * self.heff / 2) * geometry['sinTheta'])
+        Numtr1a = np.sin((self.ko * self.Weff / 2) * geometry['cosTheta'])
+        Demtr1a = ((self.ko * self.Weff / 2) * geometry['cosTheta'])
+        Ftheta = ((Numtr1 * Numtr1a) / (Demtr1 * Demtr1a)) * geometry['sinTheta']
+
+        return np.where(geometry['front'], Ftheta * Fphi * geometry['PatEdgeSF'] * self.UNF, 0)  # No radiation behind ground plane
+
+    def Grid(self, ThetaDeg, PhiDeg):
+        """
+        Etot over the ThetaDeg x PhiDeg grid (vectors, degrees), fields[phiIndex][thetaIndex].
+        Memoized by grid, the returned array is shared so must not be modified.
+        """
+        ThetaDeg = np.asarray(ThetaDeg, dtype=float)
+        PhiDeg = np.asarray(PhiDeg, dtype=float)
+        key = (ThetaDeg.tobytes(), PhiDeg.tobytes())
+        if key in self.grids:
+            self.grids.move_to_end(key)
+            return self.grids[key]
+
+        thetaDeg, phiDeg = np.meshgrid(ThetaDeg, PhiDeg)
+        fields = self.Pattern(thetaDeg, phiDeg)
+        fields.setflags(write=False)
+        self.grids[key] = fields
+        if len(self.grids) > MAX_GRIDS:
+            self.grids.popitem(last=False)
+
+        return fields
+
+
+@lru_cache(maxsize=MAX_MODELS)
+def GetPatchModel(Freq, W, L, h, Er):
+    """PatchModel for the configuration, created once and shared by every later call with the same values."""
+    return PatchModel(Freq, W, L, h, Er)
+
+
+def sph2cartArray(r, th, phi):
+  x = r * np.cos(phi) * np.sin(th)
+  y = r * np.sin(phi) * np.sin(th)
+  z = r * np.cos(th)
+
+  return x, y, z
+
+
+def cart2sphArray(x, y, z):
+  r = np.sqrt(x**2 + y**2 + z**2) + 1e-15
+  th = np.arccos(z / r)
+  phi = np.arctan2(y, x)
+
+  return r, th, phi
+
+
+def GetPatchFields(PhiStart, PhiStop, ThetaStart, ThetaStop, Freq, W, L, h, Er, PhiStep=1, ThetaStep=1):
+    """"
+    Calculates the E-field for range of thetaStart-thetaStop and phiStart-phiStop in steps of ThetaStep/PhiStep degrees
+    Returning a numpy array of form - fields[phiIndex][thetaIndex] = eField (index == degree for the default 0 start, 1° steps)
+    The array is a copy of the model's memoized grid (see PatchModel.Grid), so callers can modify it in place.
+    W......Width of patch (m)
+    L......Length of patch (m)
+    h......Substrate thickness (m)
+    Er.....Dielectric constant of substrate
+    """
+    return GetPatchModel(Freq, W, L, h, Er).Grid(np.arange(ThetaStart, ThetaStop, ThetaStep), np.arange(PhiStart, PhiStop, PhiStep)).copy()
 
 
 def DesignPatch(Er, h, Freq):
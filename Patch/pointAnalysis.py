@@ -0,0 +1,10 @@
+import PatchArray
+from PatchArray import FieldSumPatchElementPoints
+
+
+def FieldPoints(element, Freqs, physics, ThetaDeg, PhiDeg):
+    """
+    Element field at scattered directions, for evaluating a pattern on demand without a grid solve (see FarField.FromPlugin).
+    physics as physics.csv: freq, W, L, h, Er. Returns field[freq, ...] with the shape of ThetaDeg after the frequency axis
+    """
+    return FieldSumPatchElementPoints(element, Freqs, physics[1], physics[2], physics[3], physics[4], ThetaDeg, PhiDeg)
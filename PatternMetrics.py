@@ -0,0 +1,182 @@
+""" Figures of merit computed from a combined array pattern fsp[phi][theta]."""
+import json
+import numpy as np
+
+"""
+Pattern metrics (PatternSummary, one row per frequency):
+directivity_dBi.........peak power over power averaged over the sphere (sin(theta) weighted quadrature over the grid)
+peakTheta, peakPhi......direction of the peak (degs)
+beamwidthE_deg..........3 dB beamwidth in the E-plane (phi = 0°) cut
+beamwidthH_deg..........3 dB beamwidth in the H-plane (phi = 90°) cut
+sidelobeE_dB............peak sidelobe relative to the cut's peak in the E-plane, -inf if no sidelobes
+sidelobeH_dB............as sidelobeE_dB in the H-plane
+peakSidelobe_dB.........higher of sidelobeE_dB & sidelobeH_dB
+frontToBack_dB..........peak over the level in the opposite direction, nan if the grid doesn't reach it, inf if nothing is radiated there
+Cut metrics are nan when the grid doesn't hold the cut's phi planes (i.e. --phimax below 360°).
+"""
+NO_RADIATION_DB = -150                                                          # Levels this far below the peak are the fields' 1e-9 floor
+PHI_TOLERANCE = 1e-6                                                            # Degrees, a phi plane closer than this to a grid phi is on the grid
+METRIC_COLUMNS = ('freq', 'directivity_dBi', 'peakTheta', 'peakPhi', 'beamwidthE_deg', 'beamwidthH_deg',
+                  'sidelobeE_dB', 'sidelobeH_dB', 'peakSidelobe_dB', 'frontToBack_dB')
+
+
+def PlaneIndex(grid, phiDeg):
+    """Index of the grid's phi = phiDeg plane, raises ValueError if the grid doesn't hold it (rather than using the nearest plane)."""
+    index = grid.PhiIndex(phiDeg % 360)
+    if abs((grid.phi[index] - phiDeg + 180) % 360 - 180) > PHI_TOLERANCE:
+        raise ValueError("phi = " + str(phiDeg) + "° plane isn't on the grid")
+
+    return index
+
+
+def PlaneCut(fieldDb, grid, phiDeg):
+    """
+    Cut through the pattern in the phi = phiDeg plane, continuing through boresight into the phi + 180° half plane.
+    Returns (angles, values) where angles are signed theta (degrees), negative on the phi + 180° side.
+    Raises ValueError if either half plane isn't on the grid, see PlaneIndex.
+    """
+    front = fieldDb[PlaneIndex(grid, phiDeg), :]
+    back = fieldDb[PlaneIndex(grid, phiDeg + 180), :]
+
+    angles = np.concatenate((-grid.theta[:0:-1], grid.theta))                   # theta = 0 only included once
+    values = np.concatenate((back[:0:-1], front))
+
+    return angles, values
+
+
+def CutMetrics(fieldDb, grid, phiDeg):
+    """(3 dB beamwidth, peak sidelobe) of the main lobe in the phi = phiDeg plane cut, both nan if the grid doesn't hold the cut."""
+    try:
+        angles, cut = PlaneCut(fieldDb, grid, phiDeg)
+    except ValueError:
+        return np.nan, np.nan
+    cutPeak = int(np.argmax(cut))
+
+    return float(Beamwidth(angles, cut, cutPeak)), PeakSidelobe(cut, cutPeak)
+
+
+def Beamwidth(angles, valuesDb, peakIndex, level=-3):
+    """
+    Width (degrees) of the lobe at peakIndex, measured where the cut first drops `level` dB below the peak on each side.
+    Crossings are linearly interpolated, returns nan if the lobe doesn't drop to level within the cut.
+    """
+    threshold = valuesDb[peakIndex] + level
+
+    edges = []
+    for step in (-1, 1):
+        index = peakIndex
+        while 0 <= index + step < len(valuesDb) and valuesDb[index + step] > threshold:
+            index += step
+        outside = index + step
+        if not 0 <= outside < len(valuesDb):
+            return np.nan
+        fraction = (valuesDb[index] - threshold) / (valuesDb[index] - valuesDb[outside])
+        edges.append(angles[index] + fraction * (angles[outside] - angles[index]))
+
+    return abs(edges[1] - edges[0])
+
+
+def MainLobeExtent(valuesDb, peakIndex):
+    """Indices (first, last) of main lobe around peakIndex, i.e. up to the first null (local minimum) on each side."""
+    first = peakIndex
+    while first > 0 and valuesDb[first - 1] < valuesDb[first]:
+        first -= 1
+    last = peakIndex
+    while last < len(valuesDb) - 1 and valuesDb[last + 1] < valuesDb[last]:
+        last += 1
+
+    return first, last
+
+
+def PeakSidelobe(valuesDb, peakIndex):
+    """Highest level outside the main lobe, in dB relative to the peak. Returns -inf if there are no sidelobes in the cut."""
+    first, last = MainLobeExtent(valuesDb, peakIndex)
+    sidelobes = np.concatenate((valuesDb[:first], valuesDb[last + 1:]))
+    if len(sidelobes) == 0:
+        return -np.inf
+
+    return float(np.max(sidelobes) - valuesDb[peakIndex])
+
+
+def SolidAngleWeights(grid):
+    """
+    Solid angle (sr) each grid point represents, [phi][theta], so sum(weights * |fsp|^2) integrates power over the sphere.
+    Each sample covers the cell up to halfway to its neighbours. Theta cells are integrated exactly over sin(theta)
+    (cos(lower) - cos(upper)), so steps can be non-uniform. Phi wraps around when the grid covers the full circle.
+    Nothing is assumed radiated outside the grid, i.e. theta > 90° for the default front hemisphere.
+    """
+    theta = np.radians(grid.theta)
+    thetaStep = theta[-1] - theta[-2] if len(theta) > 1 else np.pi
+    thetaEdges = np.concatenate(([theta[0]], (theta[1:] + theta[:-1]) / 2, [min(theta[-1] + thetaStep / 2, np.pi)]))
+    thetaWeights = np.cos(thetaEdges[:-1]) - np.cos(thetaEdges[1:])
+
+    phi = np.radians(grid.phi)
+    phiStep = phi[-1] - phi[-2] if len(phi) > 1 else 2 * np.pi
+    if phi[-1] - phi[0] + phiStep > 2 * np.pi - 1e-9:                           # Full circle, last sample's neighbour is the first
+        phiEdges = (np.concatenate(([phi[-1] - 2 * np.pi], phi)) + np.concatenate((phi, [phi[0] + 2 * np.pi]))) / 2
+    else:
+        phiEdges = np.concatenate(([phi[0]], (phi[1:] + phi[:-1]) / 2, [phi[-1] + phiStep / 2]))
+    phiWeights = np.diff(phiEdges)
+
+    return np.outer(phiWeights, thetaWeights)
+
+
+def Directivity(fsp, grid):
+    """
+    Directivity (linear) = 4 pi x peak power / power integrated over the sphere, for each pattern of fsp[...][phi][theta].
+    Uses SolidAngleWeights, any leading axes (i.e. frequency) are kept.
+    """
+    power = np.abs(fsp) ** 2
+    total = np.sum(power * SolidAngleWeights(grid), axis=(-2, -1))
+
+    return 4 * np.pi * np.max(power, axis=(-2, -1)) / total
+
+
+def FrontToBack(fieldDb, grid, peakPhi, peakTheta):
+    """
+    Peak level over the level in the opposite direction (dB), at the nearest theta sample in the opposite phi plane.
+    Returns nan if the grid doesn't reach the opposite direction, i.e. front hemisphere only grids or the opposite phi plane missing,
+    and inf if the level there is the fields' floor (NO_RADIATION_DB below the peak), i.e. an element model radiating nothing behind.
+    """
+    backTheta = 180 - grid.theta[peakTheta]
+    if backTheta > grid.theta[-1]:
+        return np.nan
+    try:
+        backPhi = PlaneIndex(grid, grid.phi[peakPhi] + 180)
+    except ValueError:
+        return np.nan
+
+    backIndex = int(np.argmin(np.abs(grid.theta - backTheta)))
+    frontToBack = float(fieldDb[peakPhi, peakTheta] - fieldDb[backPhi, backIndex])
+    return np.inf if frontToBack > -NO_RADIATION_DB else frontToBack
+
+
+def PatternSummary(fsp, freqs, grid):
+    """Every metric of METRIC_COLUMNS for each frequency of fsp[freq][phi][theta], returns a row (dict) per frequency."""
+    directivity = Directivity(fsp, grid)
+    fieldsDb = 20 * np.log10(np.abs(fsp) + 1e-12)
+
+    rows = []
+    for freqNo, freq in enumerate(freqs):
+        fieldDb = fieldsDb[freqNo]
+        peakPhi, peakTheta = np.unravel_index(np.argmax(fieldDb), grid.shape)
+        row = {
+            'freq': float(freq),
+            'directivity_dBi': float(10 * np.log10(directivity[freqNo])),
+            'peakTheta': float(grid.theta[peakTheta]),
+            'peakPhi': float(grid.phi[peakPhi]),
+            'frontToBack_dB': FrontToBack(fieldDb, grid, peakPhi, peakTheta),
+        }
+        for phiDeg, plane in ((0, 'E'), (90, 'H')):
+            row['beamwidth' + plane + '_deg'], row['sidelobe' + plane + '_dB'] = CutMetrics(fieldDb, grid, phiDeg)
+        row['peakSidelobe_dB'] = max(row['sidelobeE_dB'], row['sidelobeH_dB'])
+        rows.append(row)
+
+    return rows
+
+
+def SaveSummary(rows, path):
+    """Saves PatternSummary rows as json, nan/inf (metric not measurable) as null so any json reader can rank runs."""
+    rows = [{key: row[key] if np.isfinite(row[key]) else None for key in METRIC_COLUMNS} for row in rows]
+    with open(path, 'w') as f:
+        json.dump({'metrics': rows}, f, indent=2)
@@ -0,0 +1,140 @@
+""" Run planning - worker count & elements per task chosen from recorded task timings, to finish by a target time within budget."""
+import json
+import math
+import os
+import time
+import numpy as np
+
+"""
+Timing history format (./results/timings.jsonl, one json object per line, one line appended per run, see Record):
+type, backend..........element type & backend the run used
+points_per_element.....field values per element, frequencies x grid points
+element_s..............median solve time per element (s), from the workers' metrics.json
+overhead_s.............median per task time outside the solve (s), python start up, transfers, provider set up
+startup_s..............time until the first task started (s), i.e. Golem negotiation
+workers, batch_size, tasks, estimate_s, actual_s, time
+Solve time is taken as proportional to field points, so runs of the same element type on other grids & frequencies still count.
+"""
+TIMINGS_PATH = './results/timings.jsonl'
+HISTORY_RUNS = 20                                                               # Latest matching runs used for an estimate
+DEFAULT_POINT_S = 6e-7                                                          # Solve time per field point without history (Patch, local)
+DEFAULT_OVERHEAD_S = {'local': 1.0, 'golem': 20.0}                              # Per task overhead without history
+DEFAULT_STARTUP_S = {'local': 0.5, 'golem': 60.0}                               # Until the first task starts without history
+BALANCE_TOLERANCE = 0.1                                                         # Batch sizes within this of the fastest favour more, smaller tasks
+
+
+class TimingModel:
+    """
+    Estimated run time of noElements elements in tasks of batchSize on workers, from the timing history of type on backend:
+    startup + waves x (overhead + batchSize x element time), a wave being one task per worker.
+    """
+
+    def __init__(self, type, backend, pointsPerElement, path=TIMINGS_PATH):
+        self.type = type
+        self.backend = backend
+        self.pointsPerElement = pointsPerElement
+        runs = [run for run in LoadHistory(path) if run['type'] == type and run['backend'] == backend][-HISTORY_RUNS:]
+        self.runs = len(runs)
+
+        sameGrid = [run for run in runs if run['points_per_element'] == pointsPerElement]
+        if sameGrid:                                                            # Measured on this grid, no scaling needed
+            self.elementSeconds = float(np.median([run['element_s'] for run in sameGrid]))
+        elif runs:
+            self.elementSeconds = float(np.median([run['element_s'] / run['points_per_element'] for run in runs])) * pointsPerElement
+        else:
+            self.elementSeconds = DEFAULT_POINT_S * pointsPerElement
+        self.overheadSeconds = float(np.median([run['overhead_s'] for run in runs])) if runs else DEFAULT_OVERHEAD_S.get(backend, 0)
+        self.startupSeconds = float(np.median([run['startup_s'] for run in runs])) if runs else DEFAULT_STARTUP_S.get(backend, 0)
+
+    def TaskSeconds(self, batchSize):
+        return self.overheadSeconds + batchSize * self.elementSeconds
+
+    def Estimate(self, noElements, workers, batchSize):
+        """Estimated seconds from dispatch until the last task finishes, batchSize can be an array of sizes to compare."""
+        if noElements == 0:
+            return 0.0
+        waves = np.ceil(np.ceil(noElements / np.asarray(batchSize)) / workers)
+        return self.startupSeconds + waves * self.TaskSeconds(np.asarray(batchSize))
+
+    def __repr__(self):
+        source = "{} recorded runs".format(self.runs) if self.runs else "defaults, no recorded runs"
+        return "TimingModel({} on {}: {:.3g}s per element, {:.3g}s per task, {:.3g}s start up, {})".format(
+            self.type, self.backend, self.elementSeconds, self.overheadSeconds, self.startupSeconds, source)
+
+
+class Plan:
+    """Workers & elements per task chosen for a run, with its estimated time (s) & cost (GLM)."""
+
+    def __init__(self, workers, batchSize, noElements, estimate, cost, model):
+        self.workers = workers
+        self.batchSize = batchSize
+        self.noElements = noElements
+        self.noTasks = math.ceil(noElements / batchSize) if noElements else 0
+        self.estimate = estimate
+        self.cost = cost
+        self.model = model
+
+    def __repr__(self):
+        text = "Plan: {} workers, {} elements per task ({} tasks), estimated {:.1f}s".format(self.workers, self.batchSize, self.noTasks, self.estimate)
+        if self.cost > 0:
+            text += ", ~{:.3g} GLM".format(self.cost)
+        return text
+
+
+def BestBatchSize(model, noElements, workers):
+    """
+    Elements per task giving (nearly) the fastest estimate on workers. Of the batch sizes within BALANCE_TOLERANCE of the fastest
+    the smallest is used, so slow providers, retries & speculative copies cost less and the load stays balanced.
+    """
+    sizes = np.arange(1, max(1, math.ceil(noElements / workers)) + 1)
+    estimates = model.Estimate(noElements, workers, sizes)
+    return int(sizes[np.argmax(estimates <= np.min(estimates) * (1 + BALANCE_TOLERANCE))])
+
+
+def PlanRun(model, noElements, targetSeconds, maxWorkers, budget=None, pricePerHour=0.0, workers=None, batchSize=None):
+    """
+    Fewest workers (each with its best batch size) estimated to finish within targetSeconds for at most budget, fewer workers
+    being cheaper & easier to find. If none can, or workers are free (pricePerHour 0, i.e. local), the fastest plan within budget.
+    Cost is workers x estimated time x pricePerHour.
+    workers or batchSize, when given, are kept as they are and only the other is chosen.
+    """
+    def Candidate(noWorkers):
+        size = batchSize if batchSize else BestBatchSize(model, noElements, noWorkers)
+        estimate = float(model.Estimate(noElements, noWorkers, size))
+        return Plan(noWorkers, size, noElements, estimate, noWorkers * estimate / 3600 * pricePerHour, model)
+
+    candidates = [Candidate(noWorkers) for noWorkers in ([workers] if workers else range(1, max(1, maxWorkers) + 1))]
+    affordable = [plan for plan in candidates if budget is None or plan.cost <= budget] or candidates[:1]
+    onTime = [plan for plan in affordable if plan.estimate <= targetSeconds]
+    if onTime and pricePerHour > 0:
+        return onTime[0]
+
+    return min(affordable, key=lambda plan: (plan.estimate, plan.workers))
+
+
+def LoadHistory(path=TIMINGS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def Record(plan, report, type, backend, actualSeconds, path=TIMINGS_PATH):
+    """
+    Appends the run's measured timings (from its RunReport rows, see TaskMetrics.py) to the history, with the plan & actual time.
+    Runs without worker metrics (i.e. all cached, or a plug-in that doesn't write metrics.json) are not recorded.
+    """
+    rows = [row for row in report.rows.values() if row.get('solve_s') is not None and row.get('elements')]
+    if not rows:
+        return None
+
+    run = {'type': type, 'backend': backend, 'points_per_element': plan.model.pointsPerElement,
+           'element_s': float(np.median([row['solve_s'] / row['elements'] for row in rows])),
+           'overhead_s': float(np.median([max(0.0, row.get('total_s', row['solve_s']) - row['solve_s']) for row in rows])),
+           'startup_s': float(min(row.get('queue_s', 0.0) for row in rows)),
+           'workers': plan.workers, 'batch_size': plan.batchSize, 'tasks': plan.noTasks,
+           'estimate_s': plan.estimate, 'actual_s': actualSeconds, 'time': time.time()}
+    with open(path, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+    return run
@@ -1,43 +1,133 @@
+import os
 import numpy as np
 import matplotlib.pyplot as plt
-import math
-from math import cos, sin
+import matplotlib.tri as tri
+from Grid import AngularGrid
+from Results import CombineBatchResults
+
+outputDir = None                                                                # When set, plots are saved here instead of shown (headless mode)
+outputFormat = 'png'
 
 def sph2cart1(r, th, phi):
-  x = r * cos(phi) * sin(th)
-  y = r * sin(phi) * sin(th)
-  z = r * cos(th)
+  """Works for scalars or numpy arrays of r, th, phi."""
+  x = r * np.cos(phi) * np.sin(th)
+  y = r * np.sin(phi) * np.sin(th)
+  z = r * np.cos(th)
 
   return x, y, z
 
-def generatePlots(noElements, freq):
+def SetOutput(directory, format='png'):
+    """
+    Headless mode - plots are rendered to directory/<name>.<format> (i.e. png or svg) rather than opened with plt.show().
+    """
+    global outputDir, outputFormat
+    outputDir = directory
+    outputFormat = format
+    os.makedirs(directory, exist_ok=True)
+    plt.switch_backend('Agg')                                                   # No display needed
+
+def ShowPlot(name):
+    """Shows current figure, or saves it as name when in headless mode."""
+    if outputDir is None:
+        plt.show()
+    else:
+        path = os.path.join(outputDir, name + '.' + outputFormat)
+        plt.savefig(path, bbox_inches='tight')
+        plt.close('all')
+        print("Saved plot: " + path)
+
+def generatePlots(noBatches, freq, grid=None):
+    """
+    Generates plots using the binary result files of each batch of elements.
+    grid is the AngularGrid the elements were solved over, defaults to the 1° 90 x 360 grid.
+    """
+    if grid is None:
+        grid = AngularGrid.Uniform()
+
+    fsp = CombineBatchResults(noBatches, grid)
+
+    PatternPlots(fsp[0], freq, grid)
+
+def FrequencySlice(fsp, freqs, freq):
+    """Pattern fsp[phi][theta] at the solved frequency closest to freq, from fsp[freq][phi][theta]."""
+    return fsp[int(np.argmin(np.abs(np.asarray(freqs) - freq)))]
+
+def FrequencyPlots(fsp, freqs, grid):
+    """
+    Plots peak & boresight level against frequency and the E/H-plane cuts at each frequency, from fsp[freq][phi][theta].
+    """
+    fspDb = 20 * np.log10(abs(fsp))
+    freqsGHz = np.asarray(freqs) / 1e9
+
+    plt.plot(freqsGHz, fspDb.max(axis=(1, 2)), label="Peak")
+    plt.plot(freqsGHz, fspDb[:, 0, 0], label="Boresight")
+    plt.ylabel('Array Pattern (dB)')
+    plt.xlabel('Frequency (GHz)')
+    plt.legend()
+    ShowPlot('frequency_peak')
+
+    fig, (ePlane, hPlane) = plt.subplots(1, 2, sharey=True)
+    for freqNo, freqGHz in enumerate(freqsGHz):
+        ePlane.plot(grid.theta, fspDb[freqNo, grid.PhiIndex(0), :], label=str(round(freqGHz, 3)) + "GHz")
+        hPlane.plot(grid.theta, fspDb[freqNo, grid.PhiIndex(90), :])
+    ePlane.set_title("E-plane (Phi=0°)")
+    hPlane.set_title("H-plane (Phi=90°)")
+    ePlane.set_ylabel('Array Pattern (dB)')
+    ePlane.set_xlabel('Theta (degs)')
+    hPlane.set_xlabel('Theta (degs)')
+    ePlane.legend()
+    ShowPlot('frequency_cuts')
+
+def PatternPlots(fsp, freq, grid):
     """
-    Generates plots using csv files of each element.
+    Plots 3D surface (dB) and E/H-plane cuts of complex array pattern fsp[phi][theta] over grid.
     """
-    elementField = np.empty((noElements, 360, 90))
-    fsp = np.full((360, 90), 1e-9 + 0j)
-
-    # Generate list of element fields from saved files
-    for elementNo in range(noElements):
-        elementField[elementNo] = np.genfromtxt('./results/elementresult' + str(elementNo) + '.csv', delimiter=',')
-
-    print(elementField[0])
-    for theta in range(90):
-        for phi in range(360):
-            elementSum = 1e-9 + 0j
-            for elementNo in range(noElements):
-                elementSum += elementField[elementNo][phi][theta]
-
-            fsp[phi][theta] = elementSum.real
-
-    SurfacePlot_dB(20 * np.log10(abs(fsp)), freq, 0, 0, 0, 0)
-    Xtheta = np.linspace(0, 90, 90)
-    plt.plot(Xtheta, 20 * np.log10(abs(fsp[90, :])), label="H-plane (Phi=90°)")                          # Log = 20 * log10(E-field)
-    plt.plot(Xtheta, 20 * np.log10(abs(fsp[0, :])), label="E-plane (Phi=0°)")
+    SurfacePlot_dB(20 * np.log10(abs(fsp)), freq, 0, 0, 0, 0, grid)
+    Xtheta = grid.theta
+    plt.plot(Xtheta, 20 * np.log10(abs(fsp[grid.PhiIndex(90), :])), label="H-plane (Phi=90°)")          # Log = 20 * log10(E-field)
+    plt.plot(Xtheta, 20 * np.log10(abs(fsp[grid.PhiIndex(0), :])), label="E-plane (Phi=0°)")
     plt.ylabel('Array Pattern (dB)')
     plt.xlabel('Theta (degs)')                                                                                  # Plot formatting
     plt.legend()
-    plt.show()
+    ShowPlot('array_cuts')
+
+def InterpolatePattern(pattern, grid, PhiMargin=5):
+    """
+    Resamples a ScatteredPattern (see Adaptive.py) onto grid, returns field magnitude fsp[phi][theta].
+    Levels are interpolated linearly in dB over a triangulation of the sample points, grid points outside the samples are nan.
+    Only samples within PhiMargin (degs, the coarse refinement step) of a grid phi are triangulated, so cuts are quick to resample.
+    """
+    index = np.searchsorted(grid.phi, pattern.phi)                                                              # Closest grid phi each side of sample
+    below = grid.phi[np.maximum(index - 1, 0)]
+    above = grid.phi[np.minimum(index, len(grid.phi) - 1)]
+    near = np.minimum(abs(pattern.phi - below), abs(pattern.phi - above)) <= PhiMargin
+
+    triangulation = tri.Triangulation(pattern.phi[near], pattern.theta[near])
+    interpolator = tri.LinearTriInterpolator(triangulation, 20 * np.log10(abs(pattern.field[near]) + 1e-300))
+    theta, phi = np.meshgrid(grid.theta, grid.phi)                                                              # Grids of form [phi][theta]
+
+    return 10 ** (interpolator(phi, theta).filled(np.nan) / 20)
+
+def AdaptivePlots(pattern, freq, cuts):
+    """
+    Plots adaptively sampled pattern: the sample points coloured by level (showing where refinement happened) and the
+    E/H-plane cuts interpolated onto cuts, a fine AngularGrid including phi = 0° & 90°.
+    """
+    fieldDb = 20 * np.log10(abs(pattern.field))
+    plt.scatter(pattern.phi, pattern.theta, c=fieldDb, s=1, vmin=fieldDb.max() - 60)
+    plt.colorbar(label='Array Pattern (dB)')
+    plt.title(str(pattern.size) + " samples at " + str(freq / 1e9) + "GHz")
+    plt.xlabel('Phi (degs)')
+    plt.ylabel('Theta (degs)')
+    ShowPlot('adaptive_points')
+
+    cutsDb = 20 * np.log10(InterpolatePattern(pattern, cuts))
+    plt.plot(cuts.theta, cutsDb[cuts.PhiIndex(90), :], label="H-plane (Phi=90°)")
+    plt.plot(cuts.theta, cutsDb[cuts.PhiIndex(0), :], label="E-plane (Phi=0°)")
+    plt.ylabel('Array Pattern (dB)')
+    plt.xlabel('Theta (degs)')
+    plt.legend()
+    ShowPlot('adaptive_cuts')
 
 def PatchEHPlanePlot(Freq, W, L, h, Er, isLog=True):
     """
@@ -66,13 +156,14 @@ def PatchEHPlanePlot(Freq, W, L, h, Er, isLog=True):
     plt.xticks(np.arange(start, end, 5))
     plt.grid(b=True, which='major')
     plt.legend()
-    plt.show()                                                                                                  # Show plot
+    ShowPlot('eh_plane')                                                                                        # Show plot
 
     return fields                                                                                               # Return the calculated fields
 
 
-def SurfacePlot(Fields, Freq, W, L, h, Er):
-    """Plots 3D surface plot over given theta/phi range in Fields by calculating cartesian coordinate equivalent of spherical form."""
+def SurfacePlot(Fields, Freq, W, L, h, Er, Grid=None):
+    """Plots 3D surface plot over given theta/phi range in Fields by calculating cartesian coordinate equivalent of spherical form.
+    Grid gives the theta/phi (degrees) of each Fields[phi][theta] sample."""
 
     print("Processing SurfacePlot...")
 
@@ -82,30 +173,24 @@ def SurfacePlot(Fields, Freq, W, L, h, Er):
     phiSize = Fields.shape[0]                                                                                   # Finds the phi & theta range
     thetaSize = Fields.shape[1]
 
-    X = np.ones((phiSize, thetaSize))                                                                           # Prepare arrays to hold the cartesian coordinate data.
-    Y = np.ones((phiSize, thetaSize))
-    Z = np.ones((phiSize, thetaSize))
-
-    for phi in range(phiSize):                                                                                  # Iterate over all phi/theta range
-        for theta in range(thetaSize):
-            e = Fields[phi][theta]
+    if Grid is None:                                                                                            # Without a grid, index == degree
+        Grid = AngularGrid(np.arange(thetaSize), np.arange(phiSize))
 
-            xe, ye, ze = sph2cart1(e, math.radians(theta), math.radians(phi))                                   # Calculate cartesian coordinates
+    theta, phi = np.meshgrid(np.radians(Grid.theta), np.radians(Grid.phi))                                     # Grids of form [phi][theta]
 
-            X[phi, theta] = xe                                                                                  # Store cartesian coordinates
-            Y[phi, theta] = ye
-            Z[phi, theta] = ze
+    X, Y, Z = sph2cart1(Fields, theta, phi)                                                                     # Calculate cartesian coordinates for all points
 
     ax.plot_surface(X, Y, Z, color='b')                                                                         # Plot surface
     plt.ylabel('Y')
     plt.xlabel('X')
     #ax.set_zlim(0,40)                                                                                          # Plot formatting
     plt.title("Patch: \nW=" + str(W) + " \nL=" + str(L) +  "\nEr=" + str(Er) + " h=" + str(h) + " \n@" + str(Freq) + "Hz")
-    plt.show()
+    ShowPlot('surface')
 
 
-def SurfacePlot_dB(Fields, Freq, W, L, h, Er):
-    """Plots 3D surface plot (in dB) over given theta/phi range in Fields by calculating cartesian coordinate equivalent of spherical form."""
+def SurfacePlot_dB(Fields, Freq, W, L, h, Er, Grid=None):
+    """Plots 3D surface plot (in dB) over given theta/phi range in Fields by calculating cartesian coordinate equivalent of spherical form.
+    Grid gives the theta/phi (degrees) of each Fields[phi][theta] sample."""
 
     print("Processing SurfacePlot...")
 
@@ -120,19 +205,12 @@ def SurfacePlot_dB(Fields, Freq, W, L, h, Er):
     phiSize = Fields.shape[0]                                                                                   # Finds the phi & theta range
     thetaSize = Fields.shape[1]
 
-    X = np.ones((phiSize, thetaSize))                                                                           # Prepare arrays to hold the cartesian coordinate data.
-    Y = np.ones((phiSize, thetaSize))
-    Z = np.ones((phiSize, thetaSize))
-
-    for phi in range(phiSize):                                                                                  # Iterate over all phi/theta range
-        for theta in range(thetaSize):
-            e = Fields[phi][theta] - minField
+    if Grid is None:                                                                                            # Without a grid, index == degree
+        Grid = AngularGrid(np.arange(thetaSize), np.arange(phiSize))
 
-            xe, ye, ze = sph2cart1(e, math.radians(theta), math.radians(phi))                                   # Calculate cartesian coordinates
+    theta, phi = np.meshgrid(np.radians(Grid.theta), np.radians(Grid.phi))                                     # Grids of form [phi][theta]
 
-            X[phi, theta] = xe                                                                                  # Store cartesian coordinates
-            Y[phi, theta] = ye
-            Z[phi, theta] = ze
+    X, Y, Z = sph2cart1(Fields - minField, theta, phi)                                                          # Calculate cartesian coordinates for all points
 
     ax.grid(False)
     ax.axis('off')
@@ -157,4 +235,4 @@ def SurfacePlot_dB(Fields, Freq, W, L, h, Er):
     myTicksPrint = np.round(myTicks + minField,2)
     cbar = fig.colorbar(surf, ticks=myTicks, shrink=0.8)
     cbar.ax.set_yticklabels(myTicksPrint)
-    plt.show()
+    ShowPlot('surface_dB')
@@ -0,0 +1,107 @@
+""" Reading of binary element result files written by the element type runAnalysis.py scripts."""
+import struct
+import zipfile
+import numpy as np
+
+"""
+Element result format (elementresult.npz, written uncompressed with np.savez), one file per batch of elements:
+field......complex field of each element, shape (len(element), len(freq), len(phi), len(theta)), i.e. fields[elementNo][freqNo][phi][theta]
+theta......theta vector of grid (degrees)
+phi........phi vector of grid (degrees)
+freq.......frequencies solved at (Hz)
+element....index within array of each element in batch
+"""
+RESULT_FIELD = 'field'
+RESULT_HEADER = ('theta', 'phi', 'freq', 'element')
+
+
+def BatchResultPath(batchNo):
+    return './results/batchresult' + str(batchNo) + '.npz'
+
+
+def LoadElementResult(path, mmap=True):
+    """
+    Loads an element result file, returning (field, header) where header is a dict of the RESULT_HEADER entries.
+    With mmap=True the field is memory mapped straight from the file rather than parsed/copied into memory.
+    """
+    with np.load(path) as data:
+        header = {key: data[key] for key in RESULT_HEADER if key in data.files}
+
+        if not mmap:
+            return data[RESULT_FIELD], header
+
+    return MemmapMember(path, RESULT_FIELD), header
+
+
+def MemmapMember(path, name):
+    """
+    Memory maps array `name` stored in an uncompressed npz (zip) file.
+    Finds the .npy data offset inside the zip using the member's local file header, then reads the .npy header for shape/dtype.
+    """
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name + '.npy')
+
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError("Can't memory map compressed member " + name + " in " + path)
+
+    with open(path, 'rb') as f:
+        f.seek(info.header_offset)
+        localHeader = f.read(30)                                                # Fixed size part of zip local file header
+        nameLength, extraLength = struct.unpack('<HH', localHeader[26:30])
+        f.seek(info.header_offset + 30 + nameLength + extraLength)              # Start of .npy data
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortranOrder else 'C')
+
+
+def CombineBatchResults(noBatches, grid, noFreqs=1):
+    """
+    Sums complex element fields from ./results/batchresultN.npz files, returning fsp[freq][phi][theta].
+    Each file is memory mapped so only the running sum is held in memory.
+    """
+    accumulator = FieldAccumulator(grid, noFreqs)
+    for batchNo in range(noBatches):
+        accumulator.AddBatch(batchNo)
+
+    return accumulator.field
+
+
+class FieldAccumulator:
+    """
+    Running complex sum fsp[freq][phi][theta] of element fields, added to as each batch result arrives.
+    Memory use is a single grid (per frequency) however many elements there are, and the partial pattern can be used/saved at any point.
+    Each batch is only added once, so duplicate results (i.e. a retried or speculatively re-run task) are ignored.
+    """
+
+    def __init__(self, grid, noFreqs=1):
+        self.grid = grid
+        self.field = np.full((noFreqs,) + grid.shape, 1e-9 + 0j)
+        self.noElements = 0
+        self.batches = set()
+
+    def Add(self, elementField):
+        """Adds stacked element fields [element][freq][phi][theta]."""
+        if elementField.shape[1:] != self.field.shape:
+            raise ValueError("Result shape " + str(elementField.shape[1:]) + " doesn't match frequencies x grid " + str(self.field.shape))
+        self.field += elementField.sum(axis=0)
+        self.noElements += elementField.shape[0]
+
+    def AddBatch(self, batchNo):
+        """Adds result of batchNo, returning its (memory mapped) field and header, or None if it was already added."""
+        if batchNo in self.batches:
+            return None
+        elementField, header = LoadElementResult(BatchResultPath(batchNo))
+        self.Add(elementField)
+        self.batches.add(batchNo)                                               # Only once added, so a failed add can be retried
+
+        return elementField, header
+
+    def Save(self, path):
+        """Saves partial pattern with number of elements summed so far."""
+        np.savez(path, field=self.field, theta=self.grid.theta, phi=self.grid.phi, elements=self.noElements)
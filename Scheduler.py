@@ -0,0 +1,257 @@
+""" Fault tolerant task scheduling - per task state journal, retries, speculative re-execution of stragglers & resuming interrupted runs."""
+import asyncio
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from Results import BatchResultPath
+
+"""
+Journal format (./results/journal.jsonl, one json object per line, appended & flushed as task states change):
+First line...{'run': key, 'batches': number of batches}, key is a hash of everything the results depend on (see RunKey)
+Then.........{'batch': batchNo, 'state': one of TASK_STATES, 'attempt': n, 'time': unix time} plus 'seconds' when done,
+             'error' when failed & 'speculative' for a straggler's extra copy
+The latest line of each batch is its state. A journal of the same run key is resumed: done batches (whose result file still exists)
+are not dispatched again.
+"""
+JOURNAL_PATH = './results/journal.jsonl'
+TASK_STATES = ('running', 'done', 'failed')
+
+
+def RunKey(paths, extra=()):
+    """Hash of the files (i.e. plug-in bundle inputs & batch files) and extra values a run's results depend on."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    for value in extra:
+        digest.update(str(value).encode())
+
+    return digest.hexdigest()[:16]
+
+
+class TaskJournal:
+    """
+    Local append only record of every task state change, so an interrupted run can be resumed.
+    With resume, a journal of the same run key is replayed, otherwise a fresh journal is started.
+    """
+
+    def __init__(self, path, runKey, noBatches, resume=False):
+        self.path = path
+        self.states = {}                                                        # batchNo -> latest journal entry
+
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+            if lines and lines[0].get('run') == runKey and lines[0].get('batches') == noBatches:
+                for entry in lines[1:]:
+                    self.states[entry['batch']] = entry
+                self.file = open(path, 'a')
+                return
+
+        self.file = open(path, 'w')
+        self.Write({'run': runKey, 'batches': noBatches})
+
+    def Write(self, entry):
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+
+    def Record(self, batchNo, state, attempt, **values):
+        """Appends batch's new state, values (i.e. seconds, error) are stored with it."""
+        entry = dict(batch=batchNo, state=state, attempt=attempt, time=time.time(), **values)
+        self.states[batchNo] = entry
+        self.Write(entry)
+
+    def Done(self):
+        """Batches completed in this or a resumed run whose result file is still there."""
+        return sorted(batchNo for batchNo, entry in self.states.items()
+                      if entry['state'] == 'done' and os.path.exists(BatchResultPath(batchNo)))
+
+    def Close(self):
+        self.file.close()
+
+
+class RoundExecutor:
+    """
+    Adapts a backend (Run(batchNos) async generator, see Backends.py) to the per task Execute(batchNo) the Scheduler uses.
+    Batches requested in the same event loop pass start together as one backend run (a round), later requests (retries, speculative
+    copies) start new rounds alongside, i.e. on Golem a new Executor so copies run on other providers.
+    A round is cancelled as soon as none of its batches are wanted any more (their Execute calls cancelled, i.e. another copy won),
+    so losing copies don't keep running (& on Golem, spending) until the end of the run.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.queued = {}                                                        # batchNo -> [futures] waiting for the next round
+        self.rounds = []
+        self.waiting = {}                                                       # Running round -> its batchNo -> [futures] not yet done
+
+    async def Execute(self, batchNo):
+        """Returns once batchNo's result is in ./results, raises if its round fails it."""
+        future = asyncio.get_event_loop().create_future()
+        if not self.queued:
+            asyncio.get_event_loop().call_soon(self.StartRound)
+        self.queued.setdefault(batchNo, []).append(future)
+
+        try:
+            return await future
+        except asyncio.CancelledError:
+            self.Abandon(batchNo, future)
+            raise
+
+    def StartRound(self):
+        futures, self.queued = self.queued, {}
+        if not futures:                                                         # All abandoned before the round started
+            return
+        round = asyncio.ensure_future(self.Round(futures))
+        self.rounds.append(round)
+        self.waiting[round] = futures
+        round.add_done_callback(lambda round: self.waiting.pop(round, None))
+
+    def Abandon(self, batchNo, future):
+        """Drops an unwanted copy's future, cancelling its round if that leaves the round with no batches wanted."""
+        for round, futures in [(None, self.queued)] + list(self.waiting.items()):
+            if future in futures.get(batchNo, []):
+                futures[batchNo].remove(future)
+                if not futures[batchNo]:
+                    del futures[batchNo]
+                if round is not None and not futures:
+                    round.cancel()
+
+    async def Round(self, futures):
+        def Failed(batchNo, error):
+            for future in futures.pop(batchNo, []):
+                if not future.done():
+                    future.set_exception(error)
+
+        try:
+            async for batchNo in self.backend.Run(sorted(futures), onFailure=Failed):
+                for future in futures.pop(batchNo, []):
+                    if not future.done():
+                        future.set_result(batchNo)
+        except Exception as error:                                              # Fails the batches the backend didn't finish
+            for batchFutures in futures.values():
+                for future in batchFutures:
+                    if not future.done():
+                        future.set_exception(error)
+            return
+        for batchFutures in futures.values():                                   # Finished without yielding them
+            for future in batchFutures:
+                if not future.done():
+                    future.set_exception(RuntimeError("Backend didn't return a result"))
+
+    async def Close(self):
+        """Stops rounds still running, i.e. the losing copies of speculatively re-run tasks, then closes the backend."""
+        for round in self.rounds:
+            round.cancel()
+        await asyncio.gather(*self.rounds, return_exceptions=True)
+        self.backend.Close()
+
+
+class Scheduler:
+    """
+    Runs batches through executor (anything with a coroutine Execute(batchNo), i.e. RoundExecutor or a fake for testing),
+    yielding each batch number once, when its first copy succeeds. Every state change is recorded in journal.
+    - A failed batch is retried up to `retries` times
+    - Once minCompleted batches have finished, a batch running longer than speculateFactor x the speculatePercentile
+      percentile of finished batch times gets one extra copy (speculative execution, once per batch), whichever copy finishes first wins.
+      Catches stragglers, slow or dead providers without waiting for a timeout. speculatePercentile=0 turns this off
+    Batches still failing after all retries are raised together as RuntimeError once every other batch has finished.
+    The executor runs at most `workers` of the first batches at once (None = all), the rest queue in order, so a queued batch's
+    run time is counted from when an earlier one finished. Retries & speculative copies start straight away (a new round).
+    """
+
+    def __init__(self, executor, journal, retries=2, speculatePercentile=90, speculateFactor=1.5, minCompleted=3, pollInterval=1.0,
+                 workers=None, clock=time.monotonic):
+        self.executor = executor
+        self.journal = journal
+        self.retries = retries
+        self.speculatePercentile = speculatePercentile
+        self.speculateFactor = speculateFactor
+        self.minCompleted = minCompleted
+        self.pollInterval = pollInterval
+        self.workers = workers
+        self.clock = clock
+
+    async def Run(self, batchNos):
+        attempts = {batchNo: 0 for batchNo in batchNos}
+        running = {}                                                            # task -> [batchNo, queue position (None = not queued), start]
+        freed = []                                                              # Times queued batches' workers became free
+        durations = []
+        done = set()
+        speculated = set()
+        failed = {}
+
+        def Launch(batchNo, position=None, **values):
+            attempts[batchNo] += 1
+            self.journal.Record(batchNo, 'running', attempts[batchNo], **values)
+            running[asyncio.ensure_future(self.executor.Execute(batchNo))] = [batchNo, position, self.clock()]
+
+        def Copies(batchNo):
+            return [task for task, (runningNo, _, _) in running.items() if runningNo == batchNo]
+
+        def Started(position, launched):
+            """Estimated start of a batch queued at position, None if it's still waiting for a worker."""
+            if position is None or self.workers is None or position < self.workers:
+                return launched
+            if position - self.workers < len(freed):
+                return max(launched, freed[position - self.workers])
+            return None
+
+        for position, batchNo in enumerate(batchNos):
+            Launch(batchNo, position)
+
+        while running:
+            finished, _ = await asyncio.wait(list(running), timeout=self.pollInterval, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                batchNo, position, launched = running.pop(task)
+                now = self.clock()
+                if position is not None:
+                    freed.append(now)
+                if batchNo in done:
+                    continue
+                error = task.exception()
+                if error is not None:
+                    self.journal.Record(batchNo, 'failed', attempts[batchNo], error=str(error))
+                    if Copies(batchNo):                                         # Another copy may still succeed
+                        continue
+                    if attempts[batchNo] <= self.retries:
+                        print("Batch " + str(batchNo) + " failed (" + str(error) + "), retrying")
+                        Launch(batchNo)
+                    else:
+                        failed[batchNo] = str(error)
+                    continue
+
+                seconds = now - Started(position, launched)
+                done.add(batchNo)
+                durations.append(seconds)
+                self.journal.Record(batchNo, 'done', attempts[batchNo], seconds=seconds)
+                for copy in Copies(batchNo):                                    # Losing copies of a speculated batch
+                    copy.cancel()
+                    running.pop(copy)
+                yield batchNo
+
+            for batchNo in self.Stragglers(running, durations, Started):
+                if batchNo not in speculated:
+                    print("Batch " + str(batchNo) + " is straggling, starting a speculative copy")
+                    speculated.add(batchNo)
+                    Launch(batchNo, speculative=True)
+
+        if failed:
+            raise RuntimeError("Batches failed after " + str(self.retries) + " retries: " +
+                               "; ".join(str(batchNo) + ": " + error for batchNo, error in sorted(failed.items())))
+
+    def Stragglers(self, running, durations, Started):
+        """Started batches with a single copy that have been running longer than the speculation threshold."""
+        if self.speculatePercentile <= 0 or len(durations) < self.minCompleted:
+            return []
+        threshold = self.speculateFactor * np.percentile(durations, self.speculatePercentile)
+
+        now = self.clock()
+        copies = {}
+        for batchNo, position, launched in running.values():
+            copies.setdefault(batchNo, []).append(Started(position, launched))
+
+        return sorted(batchNo for batchNo, starts in copies.items() if len(starts) == 1 and starts[0] is not None and now - starts[0] > threshold)
@@ -0,0 +1,95 @@
+""" Beam steering sweep - evaluates many element weight vectors against one set of solved element patterns."""
+import csv
+import math
+import numpy as np
+from PatternMetrics import CutMetrics, SolidAngleWeights
+
+MAX_CHUNK_BYTES = 256e6                                                         # Memory bound for the swept patterns of one chunk of steering angles
+SWEEP_COLUMNS = ('freq', 'steerTheta', 'steerPhi', 'peakTheta', 'peakPhi', 'peakLevel_dB', 'directivity_dBi', 'scanLoss_dB', 'beamwidth_deg',
+                 'peakSidelobe_dB')
+
+
+def BasePatterns(elementFields, ElementArray):
+    """
+    Unit weight pattern of each element, basePatterns[element][point].
+    Solved element fields include their Amp * e^j(Phase Weight), this is divided out so new weights can be applied.
+    """
+    ElementArray = np.atleast_2d(ElementArray)
+    weights = ElementArray[:, 3] * np.exp(ElementArray[:, 4] * 1j)
+
+    basePatterns = np.zeros((len(elementFields), elementFields[0].size), dtype=np.complex64)
+    for elementNo, elementField in enumerate(elementFields):
+        if weights[elementNo] != 0:                                             # Zero amplitude elements never contribute
+            basePatterns[elementNo] = np.ravel(elementField) / weights[elementNo]
+
+    return basePatterns
+
+
+def SteeringWeights(ElementArray, Freq, steerTheta, steerPhi):
+    """
+    Weight matrix [element][steer] steering the beam to each (steerTheta, steerPhi) (degrees).
+    Element amplitudes (taper) are kept, phase weights are replaced by the conjugate of the relative phase in the steer direction.
+    """
+    ElementArray = np.atleast_2d(ElementArray)
+    theta = np.radians(steerTheta)
+    phi = np.radians(steerPhi)
+    directions = np.column_stack((np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)))
+
+    phaseConstant = 2 * math.pi * Freq / 3e8
+    relativePhase = phaseConstant * np.dot(ElementArray[:, 0:3], directions.T)
+
+    return (ElementArray[:, 3:4] * np.exp(-relativePhase * 1j)).astype(np.complex64)
+
+
+def BeamSweep(basePatterns, ElementArray, Freq, grid, steerTheta, steerPhi, MaxChunkBytes=MAX_CHUNK_BYTES):
+    """
+    Evaluates pattern = basePatterns^T x weights for every steer angle (one matrix product per chunk of steer angles).
+    Returns a row per steer angle with peak direction, peak level (dB), directivity (dBi, see PatternMetrics.Directivity),
+    scan loss (directivity drop vs broadside), 3 dB beamwidth and peak sidelobe, both measured in the phi plane of the steer direction
+    (nan if the grid doesn't hold that plane).
+    """
+    solidAngles = SolidAngleWeights(grid).ravel()
+    steerTheta = np.concatenate(([0], steerTheta))                              # First steer is broadside, the scan loss reference
+    steerPhi = np.concatenate(([0], steerPhi))
+    weights = SteeringWeights(ElementArray, Freq, steerTheta, steerPhi)
+
+    rows = []
+    chunkSize = max(1, int(MaxChunkBytes // (8 * grid.size)))
+    for start in range(0, len(steerTheta), chunkSize):
+        patterns = np.dot(basePatterns.T, weights[:, start:start + chunkSize])  # [point][steer]
+        patternsDb = 20 * np.log10(np.abs(patterns) + 1e-12)
+        power = np.abs(patterns) ** 2
+        directivityDb = 10 * np.log10(4 * np.pi * np.max(power, axis=0) / np.dot(solidAngles, power))
+
+        for chunkNo in range(patterns.shape[1]):
+            steerNo = start + chunkNo
+            fieldDb = patternsDb[:, chunkNo].reshape(grid.shape)
+            peakPhi, peakTheta = np.unravel_index(np.argmax(fieldDb), grid.shape)
+
+            beamwidth, sidelobe = CutMetrics(fieldDb, grid, steerPhi[steerNo])
+
+            rows.append({
+                'steerTheta': steerTheta[steerNo],
+                'steerPhi': steerPhi[steerNo],
+                'peakTheta': grid.theta[peakTheta],
+                'peakPhi': grid.phi[peakPhi],
+                'peakLevel_dB': fieldDb[peakPhi, peakTheta],
+                'directivity_dBi': directivityDb[chunkNo],
+                'beamwidth_deg': beamwidth,
+                'peakSidelobe_dB': sidelobe,
+            })
+
+    broadside = rows.pop(0)
+    for row in rows:
+        row['scanLoss_dB'] = broadside['directivity_dBi'] - row['directivity_dBi']
+
+    return rows
+
+
+def SaveSweep(rows, path):
+    """Saves sweep table as csv."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SWEEP_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: round(float(row[key]), 4) for key in SWEEP_COLUMNS})
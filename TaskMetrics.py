@@ -0,0 +1,120 @@
+""" Per task timing & resource metrics, from the workers (metrics.json) and the requestor (send/run/download steps), reported per run."""
+import csv
+import json
+import os
+import time
+import numpy as np
+
+"""
+Worker metrics format (metrics.json, written by runAnalysis.py next to elementresult.npz):
+solve_s........time spent solving the batch (s)
+peak_rss_mb....peak resident memory of the runAnalysis.py process (MB)
+points.........field values computed, elements x frequencies x grid points
+elements.......elements in batch
+"""
+WORKER_METRICS = 'metrics.json'
+STEP_COLUMNS = ('queue_s', 'setup_s', 'send_s', 'run_s', 'download_s', 'total_s')
+WORKER_COLUMNS = ('solve_s', 'peak_rss_mb', 'points', 'elements')
+REPORT_COLUMNS = ('batch', 'provider') + STEP_COLUMNS + WORKER_COLUMNS
+PERCENTILES = (50, 90, 99)
+
+
+def BatchMetricsPath(batchNo):
+    return './results/metrics' + str(batchNo) + '.json'
+
+
+class RunReport:
+    """
+    Collects a row per batch: requestor side step timings recorded by the backend, plus the worker's own metrics.json.
+    Step timings are wall clock on the requestor, so include transfer & provider overheads the worker can't see.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.rows = {}
+
+    def Record(self, batchNo, **values):
+        """Sets values (i.e. send_s=1.2, provider='x') for a batch."""
+        self.rows.setdefault(batchNo, {'batch': batchNo}).update(values)
+
+    def AddWorkerMetrics(self, batchNo, path):
+        """Adds the worker's metrics.json for batch, plug-ins that don't write one are skipped."""
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            metrics = json.load(f)
+        self.Record(batchNo, **{key: metrics[key] for key in WORKER_COLUMNS if key in metrics})
+
+    def Summary(self):
+        """Percentiles, mean & max of every numeric column over all batches, {column: {'p50': .., 'mean': .., ..}}."""
+        summary = {}
+        for column in STEP_COLUMNS + WORKER_COLUMNS:
+            values = np.array([row[column] for row in self.rows.values() if row.get(column) is not None], dtype=float)
+            if len(values) == 0:
+                continue
+            summary[column] = {'p' + str(p): float(np.percentile(values, p)) for p in PERCENTILES}
+            summary[column].update({'mean': float(np.mean(values)), 'max': float(np.max(values)), 'count': len(values)})
+
+        return summary
+
+    def Save(self, jsonPath, csvPath):
+        """Writes per batch rows as csv, and rows + summary + run wall time as json."""
+        rows = [self.rows[batchNo] for batchNo in sorted(self.rows)]
+        with open(csvPath, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+        with open(jsonPath, 'w') as f:
+            json.dump({'wall_s': time.time() - self.started, 'summary': self.Summary(), 'tasks': rows}, f, indent=2)
+
+    def Print(self):
+        print("Task metrics (p50 / p90 / max over " + str(len(self.rows)) + " tasks):")
+        for column, stats in self.Summary().items():
+            print("  {:<12}{:>12.4g}{:>12.4g}{:>12.4g}".format(column, stats['p50'], stats['p90'], stats['max']))
+
+
+class GolemStepTimer:
+    """
+    yapapi event consumer timing each task's steps from the events of its WorkContext script, times taken on receipt.
+    Commands before the run command are sends, after it downloads, deploy/start are setup. Events are passed on to wrapped.
+    """
+
+    def __init__(self, report, wrapped=None):
+        self.report = report
+        self.wrapped = wrapped
+        self.submitted = time.time()
+        self.providers = {}                                                     # agreement id -> provider name
+        self.batches = {}                                                       # task id -> batch number
+        self.steps = {}                                                         # task id -> [time of last event, command run yet]
+
+    def __call__(self, event):
+        now = time.time()
+        name = type(event).__name__
+        taskId = getattr(event, 'task_id', None)
+
+        if name == 'AgreementCreated':
+            info = getattr(event, 'provider_info', None)
+            self.providers[event.agr_id] = getattr(info, 'name', None) or getattr(event, 'provider_id', None)
+        elif name == 'TaskStarted':
+            self.batches[taskId] = event.task_data
+            self.steps[taskId] = [now, False]
+            self.report.Record(event.task_data, queue_s=now - self.submitted, provider=self.providers.get(event.agr_id))
+        elif name == 'CommandExecuted' and taskId in self.steps:
+            last, ran = self.steps[taskId]
+            command = next(iter(event.command), '') if isinstance(event.command, dict) else str(event.command)
+            if command == 'run':
+                column, ran = 'run_s', True
+            elif command == 'transfer':
+                column = 'download_s' if ran else 'send_s'
+            else:
+                column = 'setup_s'
+            row = self.report.rows[self.batches[taskId]]
+            row[column] = row.get(column, 0) + now - last
+            self.steps[taskId] = [now, ran]
+        elif name == 'TaskFinished' and taskId in self.steps:
+            row = self.report.rows[self.batches[taskId]]
+            row['total_s'] = sum(row.get(column, 0) for column in STEP_COLUMNS[1:-1])
+
+        if self.wrapped is not None:
+            self.wrapped(event)
@@ -0,0 +1,214 @@
+""" Offline benchmarks of the element solvers, array factor, result combination and plotting - no Golem or yagna needed.
+Each case reports wall time (best of --repeat runs), field points per second and peak memory (tracemalloc, numpy buffers included).
+Results can be saved as a JSON baseline and later runs compared against it, flagging cases slower or larger than --threshold.
+Usage:
+    python benchmark.py --save benchmarks/baseline.json
+    python benchmark.py --compare benchmarks/baseline.json --threshold 0.2
+"""
+import argparse
+import contextlib
+import datetime
+import importlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+import ArrayPattern
+import Plotting
+from Grid import AngularGrid
+from Results import FieldAccumulator, BatchResultPath
+from requestor import GenerateElementArray
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_MODULES = ('ArrayFactor', 'RectPatch', 'PatchArray', 'Horn')            # Module names shared between element type folders
+
+SUITES = {
+    # (element counts, grid steps (degs) for element solvers, array factor grid step (degs))
+    'quick': ((2, 16, 64, 256), (2, 1), 2),
+    'full': ((2, 16, 64, 256, 1024, 4096), (2, 1, 0.5), 1),
+}
+MIN_CHANGE = {'wall_s': 1e-3, 'peak_mb': 0.5}                                  # Absolute changes below these are timer/allocator noise, never flagged
+COMBINE_BATCH = 64                                                              # Elements per synthetic batch when combining results
+
+FREQ = 14e9
+PATCH = (10.7e-3, 10.7e-3, 3e-3, 2.5)                                           # W, L, h, Er - requestor defaults
+SPACING = 0.012
+
+
+def LoadPlugin(type, module):
+    """
+    Imports module from an element type folder, as runAnalysis.py would on a worker.
+    Plug-ins share module names (i.e. ArrayFactor), so any copy loaded from another type is dropped first.
+    """
+    for name in PLUGIN_MODULES:
+        sys.modules.pop(name, None)
+
+    path = os.path.join(ROOT, type)
+    sys.path.insert(0, path)
+    try:
+        return importlib.import_module(module)
+    finally:
+        sys.path.remove(path)
+
+
+def SquareArray(noElements):
+    """Most square X x Y rectangular array with noElements elements."""
+    x = int(np.sqrt(noElements))
+    while noElements % x:
+        x -= 1
+    return GenerateElementArray(noElements // x, x, SPACING)
+
+
+def Cases(suite):
+    """Yields (name, points, function) for every case in suite, points = field values computed by one call of function."""
+    elementCounts, gridSteps, arrayStep = SUITES[suite]
+    W, L, h, Er = PATCH
+    element = [0, 0, 0, 1, 0]
+    offsetElement = [0.03, -0.02, 0, 1, 0.5]                                    # Away from the origin, as most elements of an array
+
+    PatchArray = LoadPlugin('Patch', 'PatchArray')
+    RectPatch = LoadPlugin('Patch', 'RectPatch')
+    PatchArrayFactor = LoadPlugin('Patch', 'ArrayFactor')
+    Horn = LoadPlugin('Horn', 'Horn')
+
+    for step in gridSteps:
+        grid = AngularGrid.Uniform(ThetaStep=step, PhiStep=step)
+        yield ('patch_element/grid' + str(step), grid.size,
+               lambda grid=grid: Cold(PatchArray.GetPatchModel, PatchArray.FieldSumPatchElement, element, FREQ, W, L, h, Er, grid.theta, grid.phi))
+        yield ('patch_element_offset/grid' + str(step), grid.size,
+               lambda grid=grid: Cold(PatchArray.GetPatchModel, PatchArray.FieldSumPatchElement, offsetElement, FREQ, W, L, h, Er, grid.theta, grid.phi))
+        yield ('horn_element/grid' + str(step), grid.size,
+               lambda grid=grid: Horn.FieldSumHorn(element, FREQ, grid.theta, grid.phi))
+        yield ('patch_fields/grid' + str(step), grid.size,
+               lambda step=step: Cold(RectPatch.GetPatchModel, RectPatch.GetPatchFields, 0, 360, 0, 90, FREQ, W, L, h, Er, step, step))
+
+    grid = AngularGrid.Uniform(ThetaStep=arrayStep, PhiStep=arrayStep)
+    for noElements in elementCounts:
+        ElementArray = SquareArray(noElements)
+        points = grid.size * noElements
+        yield ('array_factor/n' + str(noElements), points,
+               lambda ElementArray=ElementArray, grid=grid: PatchArrayFactor.ArrayFactor(ElementArray, FREQ, grid.theta, grid.phi))
+        yield ('array_factor_separable/n' + str(noElements), points,
+               lambda ElementArray=ElementArray, grid=grid: ArrayPattern.ArrayFactorComplex(ElementArray, FREQ, grid))
+        yield ('combine/n' + str(noElements), points,
+               lambda noElements=noElements, grid=grid: CombineElements(noElements, grid))
+
+    for step in gridSteps:
+        grid = AngularGrid.Uniform(ThetaStep=step, PhiStep=step)
+        field = PatchArray.FieldSumPatchElement(element, FREQ, W, L, h, Er, grid.theta, grid.phi)
+        yield ('plots/grid' + str(step), grid.size, lambda field=field, grid=grid: GeneratePlots(field, grid))
+
+
+def Cold(modelCache, function, *args):
+    """function(*args) with the patch model cache (an lru_cache, see RectPatch.GetPatchModel) cleared, so memoized grids aren't timed."""
+    modelCache.cache_clear()
+    return function(*args)
+
+
+def CombineElements(noElements, grid):
+    """Streams noElements synthetic element fields through FieldAccumulator in batches, as requestor.py does."""
+    batch = np.ones((min(noElements, COMBINE_BATCH), 1) + grid.shape, dtype=np.complex64)
+    accumulator = FieldAccumulator(grid)
+    for start in range(0, noElements, COMBINE_BATCH):
+        accumulator.Add(batch[:noElements - start])
+
+    return accumulator.field
+
+
+def GeneratePlots(field, grid):
+    """Plotting.generatePlots on a single element field saved as a batch result, rendered headless into a temporary folder."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            os.makedirs('./results')
+            np.savez(BatchResultPath(0), field=field[np.newaxis, np.newaxis].astype(np.complex64), theta=grid.theta,
+                     phi=grid.phi, freq=[FREQ], element=[0])
+            Plotting.SetOutput('./plots')
+            with contextlib.redirect_stdout(io.StringIO()):
+                Plotting.generatePlots(1, FREQ, grid)
+        finally:
+            os.chdir(cwd)
+
+
+def Measure(function, repeat):
+    """Returns (best wall time (s), peak memory (bytes)). Memory is measured on a separate run as tracing slows execution."""
+    function()                                                                  # Warm up, i.e. imports & caches
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(times), peak
+
+
+def RunSuite(suite, repeat, filter=None):
+    results = {}
+    for name, points, function in Cases(suite):
+        if filter is not None and filter not in name:
+            continue
+        wall, peak = Measure(function, repeat)
+        results[name] = {'wall_s': wall, 'points': points, 'points_per_s': points / wall, 'peak_mb': peak / 1e6}
+        print("{:<36}{:>10.4f}s{:>14.3g} points/s{:>10.1f}MB".format(name, wall, points / wall, peak / 1e6))
+
+    return results
+
+
+def Compare(results, baseline, threshold):
+    """Returns names of cases whose wall time or peak memory grew by more than threshold (fraction) vs baseline."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for key in ('wall_s', 'peak_mb'):
+            change = result[key] / max(baseline[name][key], 1e-12) - 1
+            if change > threshold and result[key] - baseline[name][key] > MIN_CHANGE[key]:
+                regressions.append(name)
+                print("REGRESSION {:<36}{:<8}{:>+8.1%}".format(name, key, change))
+
+    return sorted(set(regressions))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark element solvers, array factor, result combination & plotting')
+    parser.add_argument('--suite', type=str, choices=sorted(SUITES), help='quick or full (element counts up to 4096)', default='quick')
+    parser.add_argument('--repeat', type=int, help='Timed runs per case, the best is reported', default=3)
+    parser.add_argument('--filter', type=str, help='Only run cases whose name contains this text', default=None)
+    parser.add_argument('--save', type=str, help='Save results as a JSON baseline', default=None)
+    parser.add_argument('--compare', type=str, help='Baseline JSON to compare against', default=None)
+    parser.add_argument('--threshold', type=float, help='Allowed fractional increase in wall time/peak memory vs baseline', default=0.2)
+    args = parser.parse_args()
+
+    results = RunSuite(args.suite, args.repeat, args.filter)
+
+    if args.save is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        report = {
+            'meta': {'suite': args.suite, 'date': datetime.datetime.now().isoformat(), 'python': platform.python_version(),
+                     'numpy': np.__version__, 'platform': platform.platform()},
+            'cases': results,
+        }
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print("Results saved to " + args.save)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)['cases']
+        regressions = Compare(results, baseline, args.threshold)
+        print(str(len(regressions)) + " regressions above " + str(args.threshold * 100) + "%")
+        if regressions:
+            sys.exit(1)
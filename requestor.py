@@ -1,97 +1,321 @@
 import argparse
 import Plotting
+import ArrayPattern
+import Backends
+import Sweep
+import Adaptive
+import Layout
+from PatternMetrics import PlaneCut, Beamwidth, PeakSidelobe, PatternSummary, SaveSummary
+from FarField import FarField, LoadPointSolver
+from Cache import ResultCache, PluginHash
+from Grid import AngularGrid
+from Results import FieldAccumulator, LoadElementResult, BatchResultPath
+from TaskMetrics import RunReport, BatchMetricsPath
+from Scheduler import Scheduler, TaskJournal, RoundExecutor, RunKey, JOURNAL_PATH
+from Planner import TimingModel, PlanRun, Record, TIMINGS_PATH
 import os
 import numpy as np
 import asyncio
-from yapapi import Executor, Task, WorkContext
-from yapapi.log import enable_default_logger, log_summary, log_event_repr
-from yapapi.package import vm
-from datetime import timedelta
+import math
+import sys
+import time
+
+PARTIAL_RESULT_PATH = './results/partial.npz'
+PATTERN_RESULT_PATH = './results/pattern.npz'
+ADAPTIVE_RESULT_PATH = './results/adaptive.npz'
+TASK_REPORT_PATHS = ('./results/tasks.json', './results/tasks.csv')
+SWEEP_RESULT_PATH = './results/sweep.csv'
+METRICS_RESULT_PATH = './results/pattern_metrics.json'
+
+def ParseRange(text):
+    """'start:stop:step' (stop inclusive) or 'a,b,c' list of values, i.e. angles or frequencies."""
+    if ':' in text:
+        start, stop, step = [float(value) for value in text.split(':')]
+        return np.arange(start, stop + step / 2, step)
+
+    return np.array([float(value) for value in text.split(',')])
 
 def GenerateElementArray(X_Elements, Y_Elements, ElementSpacing):
     """
-    Returns an empty numpy multidimensional array matching Element configuration.
+    Returns the element rows of an X x Y rectangular array, see Layout.py for other layouts.
     """
-    noPatches = X_Elements * Y_Elements
-    ElementArray = np.empty((noPatches, 5))
-    if(Y_Elements == 1):
-        # TO DO X = 1
-        min = -1.0 * ((X_Elements/2 - 1) + 0.5) * ElementSpacing
-        for xNo in range(X_Elements):
-            ElementArray[xNo] = [min, 0, 0, 1, 0]
-            min += ElementSpacing
+    return Layout.Rectangular(X_Elements, Y_Elements, ElementSpacing)
+
+def BuildLayout(args):
+    """ElementArray for the --layout chosen, with the --taper amplitudes applied. Circular & file layouts are tapered radially."""
+    if args.layout == 'rect':
+        ElementArray = GenerateElementArray(args.xelements, args.yelements, args.spacing)
+    elif args.layout == 'hex':
+        ElementArray = Layout.Triangular(args.xelements, args.yelements, args.spacing)
+    elif args.layout == 'circular':
+        ElementArray = Layout.Circular(args.rings, args.spacing)
     else:
-        patchCount = 0
-        minY = -1.0 * ((Y_Elements/2 - 1) + 0.5) * ElementSpacing
-        for y in range(Y_Elements):
-            minX = -1.0 * ((X_Elements/2 - 1) + 0.5) * ElementSpacing
-            for x in range(X_Elements):
-                ElementArray[patchCount] = [minX, minY, 0, 1, 0]
-                minX += ElementSpacing
-                patchCount += 1
-            minY += ElementSpacing
+        ElementArray = Layout.Load(args.layoutfile)
+
+    if args.taper != 'uniform':
+        ElementArray = Layout.ApplyTaper(ElementArray, args.taper, args.sidelobe, radial=args.layout in ('circular', 'file'))
 
     return ElementArray
 
+def MaxWorkers(backend):
+    """Most workers the planner may use when --maxworkers isn't given: every core locally, a modest number of Golem providers."""
+    return os.cpu_count() if backend == 'local' else 16
+
+def SaveBatches(ElementArray, batchSize, indices=None):
+    """
+    Saves contiguous slices of batchSize elements as packed input files, ./elements/batchN.npz, one per task.
+    indices selects which elements to save (default all), i.e. only those not already cached.
+    Each file holds the element rows and their index within the array. Returns number of batches.
+    """
+    if indices is None:
+        indices = np.arange(len(ElementArray))
+    indices = np.asarray(indices, dtype=int)
+
+    noBatches = math.ceil(len(indices) / batchSize)
+    for batchNo in range(noBatches):
+        batchIndices = indices[batchNo * batchSize:(batchNo + 1) * batchSize]
+        np.savez('./elements/batch' + str(batchNo) + '.npz', elements=ElementArray[batchIndices], indices=batchIndices)
+
+    return noBatches
+
+def SolvedElementFields(args):
+    """Solved field of each element in args['solveArray'] (memory mapped), from the cache or this run's batch results."""
+    if args['cache'] is not None:
+        return [args['cache'].Get(key) for key in args['keys']]
+
+    fields = [None] * len(args['solveArray'])
+    for batchNo in range(args['noBatches']):
+        elementField, header = LoadElementResult(BatchResultPath(batchNo))
+        for fieldNo, elementNo in enumerate(header['element']):
+            fields[elementNo] = elementField[fieldNo]
+
+    return fields
+
+def FrontToBackText(frontToBack):
+    """Front/back ratio for printing, see PatternMetrics.FrontToBack."""
+    if np.isnan(frontToBack):
+        return "n/a (opposite direction not on the grid)"
+    if np.isinf(frontToBack):
+        return "unbounded (nothing radiated behind)"
+    return "{:.2f}dB".format(frontToBack)
+
+def FrequencyIndex(args):
+    """Index of the solved frequency closest to args['freq'], the one plotted & queried."""
+    return int(np.argmin(np.abs(args['freqs'] - args['freq'])))
+
+def ParseDirections(text):
+    """'theta:phi,theta:phi' (degs) to a list of (theta, phi)."""
+    return [tuple(float(value) for value in direction.split(':')) for direction in text.split(',')]
+
+def RunQuery(directions, farField):
+    """Array pattern level in each (theta, phi) direction, evaluated on demand without a grid, see FarField."""
+    for theta, phi in directions:
+        print("Direction ({:.2f}°, {:.2f}°): {:.2f}dB".format(theta, phi, 20 * np.log10(abs(farField.Point(theta, phi)))))
+
+def AdaptiveFunction(type, physics, ElementArray, freq):
+    """
+    Array pattern function(thetaDeg, phiDeg) -> complex field at freq for adaptive refinement, solved by the element type's point solver
+    (see FarField.LoadPointSolver) at exactly the sample directions, None if there's none. Identical elements are the reference element
+    x array factor (pattern multiplication), otherwise every element's field is summed, costing elements x samples solves.
+    """
+    solver = LoadPointSolver(type)
+    if solver is None:
+        return None
+    if ArrayPattern.IdenticalElements(ElementArray):
+        return FarField.FromPlugin(type, physics, ElementArray, freq)
+
+    def ElementSum(thetaDeg, phiDeg):
+        return sum(solver(element, [freq], physics, thetaDeg, phiDeg)[0] for element in ElementArray)
+
+    return ElementSum
+
+def RunAdaptive(patternFunction, ThetaStop, freq, ToleranceDb, MaxSamples):
+    """Adaptively sampled array pattern at freq, see Adaptive.RefinePattern & AdaptiveFunction."""
+    pattern = Adaptive.RefinePattern(patternFunction, ThetaStop, 360, ToleranceDb=ToleranceDb, MaxSamples=MaxSamples)
+    pattern.Save(ADAPTIVE_RESULT_PATH)
+    print("Adaptive pattern: " + str(pattern.size) + " samples, saved to " + ADAPTIVE_RESULT_PATH)
+
+    # Principal plane cuts interpolated finely from the samples
+    cuts = AngularGrid(np.arange(0, ThetaStop, 0.01), [0, 90, 180, 270])
+    fieldDb = 20 * np.log10(Plotting.InterpolatePattern(pattern, cuts))
+    for phiDeg, name in ((0, "E-plane"), (90, "H-plane")):
+        angles, cut = PlaneCut(fieldDb, cuts, phiDeg)
+        peak = int(np.nanargmax(cut))
+        print("{}: beamwidth {:.3f}°, peak sidelobe {:.2f}dB".format(name, Beamwidth(angles, cut, peak), PeakSidelobe(cut, peak)))
+
+    Plotting.AdaptivePlots(pattern, freq, cuts)
+
+def RunSweep(args):
+    """Beam steering sweep over args['sweep'] steer angles using the solved element patterns, no new element solves needed."""
+    steerTheta, steerPhi = args['sweep']
+    elementFields = SolvedElementFields(args)
+
+    print("Sweeping " + str(len(steerTheta)) + " steer angles at " + str(len(args['freqs'])) + " frequencies...")
+    rows = []
+    for freqNo, freq in enumerate(args['freqs']):
+        if args['patternArray'] is not None:
+            ElementArray = args['patternArray']
+            basePatterns = ArrayPattern.EmbeddedPatterns(elementFields[0][freqNo], ElementArray, freq, args['grid'])
+        else:
+            ElementArray = args['solveArray']
+            basePatterns = Sweep.BasePatterns([elementField[freqNo] for elementField in elementFields], ElementArray)
+
+        for row in Sweep.BeamSweep(basePatterns, ElementArray, freq, args['grid'], steerTheta, steerPhi):
+            row['freq'] = freq
+            rows.append(row)
+
+    Sweep.SaveSweep(rows, SWEEP_RESULT_PATH)
+    for row in rows:
+        print("{:.4g}Hz, steer ({:.1f}°, {:.1f}°): directivity {:.2f}dBi, scan loss {:.2f}dB, beamwidth {:.2f}°, peak sidelobe {:.2f}dB".format(
+            row['freq'], row['steerTheta'], row['steerPhi'], row['directivity_dBi'], row['scanLoss_dB'], row['beamwidth_deg'], row['peakSidelobe_dB']))
+    print("Sweep saved to " + SWEEP_RESULT_PATH)
+
 async def main(args):
-    print("Analysing " + str(args['noElements']) + " elements...")
-
-    package = await vm.repo(
-        image_hash="7c78a5c3da0f3ea1c03c8a87c4a1055c7d8035f2c108c4d9db443f56",
-        min_mem_gib=0.5,
-        min_storage_gib=2.0,
-    )
-
-    async def worker(ctx: WorkContext, tasks):
-        print("WORKER")
-        async for task in tasks:
-            print("Worker for element no: " + str(task.data))
-            # Sends current element info
-            ctx.send_file('./elements/element' + str(task.data) + '.csv', "/golem/work/element.csv")
-            # Sends physics file which contains freq, etc
-            ctx.send_file('./elements/physics.csv', "/golem/work/physics.csv")
-            # Send each file in element type folder. Must have an runAnalysis.py file. Allows for many different Element types to be analysed!
-            for file in args['files']:
-                print(f"Sending file: ./{type}/{file}")
-                ctx.send_file(f'./{type}/{file}', f"/golem/work/{file}")
-
-            print("Files sent, running analysis...")
-            # Process for element
-            ctx.run("/bin/sh", "-c", f"python3 /golem/work/runAnalysis.py >> /golem/work/output.txt")
-            print("Downloading outputs...")
-            # Can use to check processing ran ok
-            ctx.download_file("/golem/work/output.txt", "./results/output" + str(task.data) + ".txt")
-            # Actual result for element
-            ctx.download_file("/golem/work/elementresult.csv", "./results/elementresult" + str(task.data) + ".csv")
-            yield ctx.commit()
-            task.accept_result()
-
-    async with Executor(
-        package=package,
-        max_workers=3,
-        budget=10.0,
-        timeout=timedelta(minutes=10),
-        subnet_tag="community.3",
-        event_consumer=log_summary(),
-    ) as executor:
-        async for task in executor.submit(worker, [Task(data=elementNo) for elementNo in range(args['noElements'])]):
-            print(f"Worker Done: {task}")
-
-
-        print("Golem Jobs Complete. Processing results...")
-        Plotting.generatePlots(args['noElements'], args['freq'])
+    print("Analysing " + str(args['noElements']) + " elements in " + str(args['noBatches']) + " tasks...")
+
+    cache = args['cache']
+    Backend = Backends.BACKENDS[args['backend']]
+    accumulator = FieldAccumulator(args['grid'], len(args['freqs']))
+    for elementNo in args['cached']:
+        accumulator.Add(cache.Get(args['keys'][elementNo])[np.newaxis])
+
+    def Collect(batchNo):
+        report.AddWorkerMetrics(batchNo, BatchMetricsPath(batchNo))
+        if cache is not None:
+            elementField, header = LoadElementResult(BatchResultPath(batchNo))
+            for fieldNo, elementNo in enumerate(header['element']):
+                cache.Put(args['keys'][elementNo], elementField[fieldNo])
+        if args['partial']:
+            accumulator.Save(PARTIAL_RESULT_PATH)
+        print("Combined " + str(accumulator.noElements) + "/" + str(len(args['solveArray'])) + " elements")
+
+    # Element results are summed by the backend as each batch arrives, so a partial pattern is available before stragglers finish.
+    # Task states are journaled, failed tasks retried & stragglers re-run, see Scheduler.py
+    if args['noBatches'] > 0:
+        report = RunReport()
+        journal = TaskJournal(JOURNAL_PATH, args['runKey'], args['noBatches'], args['resume'])
+        for batchNo in journal.Done():                                          # Finished before the run was interrupted
+            accumulator.AddBatch(batchNo)
+            Collect(batchNo)
+        pending = [batchNo for batchNo in range(args['noBatches']) if batchNo not in journal.Done()]
+        if args['resume']:
+            print("Resuming: " + str(args['noBatches'] - len(pending)) + " tasks already done, " + str(len(pending)) + " to run")
+
+        backend = Backend(args['type'], args['files'], workers=args['workers'], report=report, accumulator=accumulator, **args['backendOptions'])
+        executor = RoundExecutor(backend)
+        scheduler = Scheduler(executor, journal, retries=args['retries'], speculatePercentile=args['speculate'], workers=args['workers'])
+        dispatched = time.time()
+        try:
+            async for batchNo in scheduler.Run(pending):
+                Collect(batchNo)
+        finally:
+            await executor.Close()
+            journal.Close()
+
+        # Planned vs actual time, the run's timings are added to the history future plans are made from
+        actual = time.time() - dispatched
+        plan = args['plan']
+        print("Planned {:.1f}s, took {:.1f}s ({:+.0f}%)".format(plan.estimate, actual, 100 * (actual - plan.estimate) / max(plan.estimate, 1e-9)))
+        if not args['resume'] and Record(plan, report, args['type'], args['backend'], actual) is not None:
+            print("Timings added to " + TIMINGS_PATH)
+
+        report.Save(*TASK_REPORT_PATHS)
+        report.Print()
+        print("Task report saved to " + TASK_REPORT_PATHS[0] + " & " + TASK_REPORT_PATHS[1])
+
+    print("Jobs Complete. Processing results...")
+    if args['sweep'] is not None:
+        RunSweep(args)
+
+    if cache is not None:
+        cache.Evict()
+        print(cache.Summary())
+
+    fsp = accumulator.field
+    if args['adaptive'] > 0 and args['patternArray'] is not None:
+        # No point solver (otherwise refined before dispatch), the solved reference element grid (smooth) is interpolated at each
+        # sample x array factor (main beam, sidelobes & nulls)
+        freqNo = FrequencyIndex(args)
+        RunAdaptive(FarField.FromGrid(fsp[freqNo], args['grid'], args['patternArray'], args['freqs'][freqNo]), args['grid'].theta[-1],
+                    args['freqs'][freqNo], args['adaptive'], args['adaptiveSamples'])
+    elif args['adaptive'] > 0:
+        print("Adaptive refinement needs --patternmult or an element type with a point solver (pointAnalysis.py), skipped")
+    if args['query'] is not None:
+        # Solved reference element x array factor, or the summed array pattern (interpolated between grid points)
+        freqNo = FrequencyIndex(args)
+        queryArray = args['patternArray'] if args['patternArray'] is not None else ArrayPattern.ReferenceElement()
+        RunQuery(args['query'], FarField.FromGrid(fsp[freqNo], args['grid'], queryArray, args['freqs'][freqNo]))
+
+    if args['patternArray'] is not None:
+        # Single element solved, combine with array factor
+        fsp = ArrayPattern.PatternMultiply(fsp, args['patternArray'], args['freqs'], args['grid'])
+
+    # Combined pattern fsp[freq][phi][theta]
+    np.savez(PATTERN_RESULT_PATH, field=fsp, theta=args['grid'].theta, phi=args['grid'].phi, freq=args['freqs'])
+
+    # Figures of merit per frequency, saved as json so design runs can be ranked without plots
+    metrics = PatternSummary(fsp, args['freqs'], args['grid'])
+    SaveSummary(metrics, args['metrics'])
+    for row in metrics:
+        print("{:.4g}Hz: directivity {:.2f}dBi at ({:.1f}°, {:.1f}°), beamwidth E {:.2f}° H {:.2f}°, peak sidelobe {:.2f}dB, front/back {}".format(
+            row['freq'], row['directivity_dBi'], row['peakTheta'], row['peakPhi'], row['beamwidthE_deg'], row['beamwidthH_deg'],
+            row['peakSidelobe_dB'], FrontToBackText(row['frontToBack_dB'])))
+    print("Pattern metrics saved to " + args['metrics'])
+
+    if len(args['freqs']) > 1:
+        Plotting.FrequencyPlots(fsp, args['freqs'], args['grid'])
+    Plotting.PatternPlots(Plotting.FrequencySlice(fsp, args['freqs'], args['freq']), args['freq'], args['grid'])
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Design Your Own Antenna Array - Powered By Golem')
     parser.add_argument('--type', type=str, help='Element type', default="Patch")
     parser.add_argument('--freq', type=float, help='Frequency of operation', default=14e9)
+    parser.add_argument('--freqs', type=str, help="Frequency sweep as 'start:stop:step' or 'f1,f2,f3' (Hz), --freq then selects the frequency plotted", default=None)
     parser.add_argument('--width', type=float, help='Width Of Patch', default=10.7e-3)
     parser.add_argument('--length', type=float, help='Length Of Patch', default=10.7e-3)
     parser.add_argument('--h', type=float, help='Height of Patch', default=3e-3)
     parser.add_argument('--Er', type=float, help='Permittivity', default=2.5)
+    parser.add_argument('--q', type=float, help='Horn cos q(theta) pattern exponent', default=28)
+    parser.add_argument('--qe', type=float, help='Horn E-plane (phi=0°) exponent, defaults to --q', default=None)
+    parser.add_argument('--qh', type=float, help='Horn H-plane (phi=90°) exponent, defaults to --q', default=None)
     parser.add_argument('--xelements', type=int, help='Number of X Elements', default=2)
     parser.add_argument('--yelements', type=int, help='Number of Y Elements', default=1)
     parser.add_argument('--spacing', type=float, help='Space Between Elements', default=0.06)
+    parser.add_argument('--layout', type=str, help='Element layout: rect (x by y grid), hex (triangular lattice, x per row, y rows), circular (--rings) or file (--layoutfile)',
+                        choices=['rect', 'hex', 'circular', 'file'], default='rect')
+    parser.add_argument('--rings', type=int, help='Number of rings around the centre element for circular layout', default=3)
+    parser.add_argument('--layoutfile', type=str, help='Layout .csv/.npy with rows x, y[, z, amplitude, phase]', default=None)
+    parser.add_argument('--taper', type=str, help='Amplitude taper', choices=sorted(Layout.TAPERS), default='uniform')
+    parser.add_argument('--sidelobe', type=float, help='Taper design sidelobe level (dB)', default=-30)
+    parser.add_argument('--thetamax', type=float, help='Theta range 0-thetamax (degs), use 180 for full sphere', default=90)
+    parser.add_argument('--phimax', type=float, help='Phi range 0-phimax (degs)', default=360)
+    parser.add_argument('--thetastep', type=float, help='Theta resolution (degs)', default=1)
+    parser.add_argument('--phistep', type=float, help='Phi resolution (degs)', default=1)
+    parser.add_argument('--finetheta', type=float, help='Use finer theta resolution from boresight up to this theta (degs), 0 = off', default=0)
+    parser.add_argument('--finethetastep', type=float, help='Theta resolution within finetheta region (degs)', default=0.1)
+    parser.add_argument('--backend', type=str, help='Where element batches run: golem or local (process pool on this machine)', choices=sorted(Backends.BACKENDS), default='golem')
+    parser.add_argument('--workers', type=int, help='Number of workers (Golem providers or local processes), 0 = planned from recorded timings', default=0)
+    parser.add_argument('--batchsize', type=int, help='Elements per task, 0 = planned from recorded timings', default=0)
+    parser.add_argument('--maxworkers', type=int, help='Most workers the plan may use, 0 = cores for local, 16 for golem', default=0)
+    parser.add_argument('--target', type=float, help="Target time for the tasks to finish (s), Golem plans use the fewest providers that meet it", default=300)
+    parser.add_argument('--budget', type=float, help='Golem budget (GLM)', default=10.0)
+    parser.add_argument('--price', type=float, help='Expected Golem price per provider hour (GLM), keeps the plan within --budget', default=0.1)
+    parser.add_argument('--patternmult', action='store_true', help='Solve element pattern once and combine with array factor (identical elements only)')
+    parser.add_argument('--retries', type=int, help='Times a failed task is retried', default=2)
+    parser.add_argument('--speculate', type=float, help='Re-run tasks taking 1.5x longer than this percentile of finished task times, 0 = off', default=90)
+    parser.add_argument('--resume', action='store_true', help='Resume an interrupted run from ' + JOURNAL_PATH + ', skipping tasks already done')
+    parser.add_argument('--partial', action='store_true', help='Save combined pattern so far to ' + PARTIAL_RESULT_PATH + ' as each task completes')
+    parser.add_argument('--sweeptheta', type=str, help="Beam steering sweep, steer theta angles as 'start:stop:step' or 'a,b,c' (degs)", default=None)
+    parser.add_argument('--adaptive', type=float, help='Adaptively refine pattern to this dB tolerance, i.e. 0.05, and exit (element types with a point solver, without dispatching a grid solve)', default=0)
+    parser.add_argument('--adaptivesamples', type=int, help='Most samples adaptive refinement may evaluate', default=10000)
+    parser.add_argument('--query', type=str, help="Print pattern level in directions 'theta:phi,theta:phi' (degs). Identical elements of a type with a point solver: solving only those directions, then exit. Otherwise: from the solved grid after the run", default=None)
+    parser.add_argument('--sweepphi', type=str, help="Steer phi angles for sweep as 'start:stop:step' or 'a,b,c' (degs)", default='0')
+    parser.add_argument('--metrics', type=str, help='Save directivity, beamwidth, sidelobe & front/back metrics to this json file', default=METRICS_RESULT_PATH)
+    parser.add_argument('--plotdir', type=str, help='Save plots to this folder instead of showing them (headless)', default=None)
+    parser.add_argument('--plotformat', type=str, help='Format of saved plots', choices=['png', 'svg', 'pdf'], default='png')
+    parser.add_argument('--cachedir', type=str, help='Folder for cached element results', default='./cache')
+    parser.add_argument('--cachesize', type=float, help='Maximum cache size (MB), least recently used results are evicted', default=1000)
+    parser.add_argument('--nocache', action='store_true', help='Recompute every element, ignoring cached results')
     # These are the variables a user can alter to design their array
     args = parser.parse_args()
     type = args.type
@@ -104,22 +328,98 @@ if __name__ == "__main__":
     Y_Elements = args.yelements
     spacing = args.spacing
 
-    # Generate multidimensional array matching Element configuration
-    ElementArray = GenerateElementArray(X_Elements, Y_Elements, spacing)
+    if args.plotdir is not None:
+        Plotting.SetOutput(args.plotdir, args.plotformat)
+
+    # Angular grid elements are solved over
+    if args.finetheta > 0:
+        grid = AngularGrid.Refined(args.thetamax, args.phimax, args.thetastep, args.phistep, args.finetheta, args.finethetastep)
+    else:
+        grid = AngularGrid.Uniform(args.thetamax, args.phimax, args.thetastep, args.phistep)
+    print(grid)
+
+    # Generate multidimensional array matching Element configuration, saved as one table
+    if args.layout == 'file' and args.layoutfile is None:
+        print("--layout file needs --layoutfile")
+        sys.exit()
+    ElementArray = BuildLayout(args)
     noElements = len(ElementArray)
+    Layout.SaveTable(ElementArray)
+
+    # All frequencies are solved per element in one task, sharing frequency independent geometry
+    freqs = ParseRange(args.freqs) if args.freqs is not None else np.array([freq])
 
     # Save physics info (freq, etc) in file to pass to Golem workers
-    np.savetxt('./elements/physics.csv', [freq, W, L, h, Er], delimiter=',')
+    physics = [freqs[0], W, L, h, Er, args.qe if args.qe is not None else args.q, args.qh if args.qh is not None else args.q]
+    np.savetxt('./elements/physics.csv', physics, delimiter=',')
+    np.savetxt('./elements/frequencies.csv', freqs, delimiter=',')
+    grid.Save('./elements/grid.npz')
+
+    # Direction queries of identical elements & adaptive refinement only need the pattern in the directions they sample, solved here by
+    # the plug-in's point solver without dispatching a grid solve. Otherwise queries are answered from the solved grid after the run
+    pointSolver = LoadPointSolver(type) is not None
+    pointQuery = args.query is not None and ArrayPattern.IdenticalElements(ElementArray) and pointSolver
+    if pointQuery or (args.adaptive > 0 and pointSolver):
+        selectedFreq = freqs[int(np.argmin(np.abs(freqs - freq)))]
+        if pointQuery:
+            RunQuery(ParseDirections(args.query), FarField.FromPlugin(type, physics, ElementArray, selectedFreq))
+        elif args.query is not None:
+            print("Direction queries of differing elements need a grid solve, skipped with --adaptive")
+        if args.adaptive > 0:
+            RunAdaptive(AdaptiveFunction(type, physics, ElementArray, selectedFreq), grid.theta[-1], selectedFreq, args.adaptive,
+                        args.adaptivesamples)
+        sys.exit()
+
+    patternArray = None
+    solveArray = ElementArray
+    if args.patternmult and ArrayPattern.IdenticalElements(ElementArray):
+        # Pattern multiplication - only the reference element is solved remotely, array factor is applied locally
+        print("Identical elements, using pattern multiplication")
+        patternArray = ElementArray
+        solveArray = ArrayPattern.ReferenceElement()
+    elif args.patternmult:
+        print("Elements differ in type/orientation, solving each element")
+
+    sweep = None
+    if args.sweeptheta is not None:
+        steerTheta, steerPhi = np.meshgrid(ParseRange(args.sweeptheta), ParseRange(args.sweepphi))
+        sweep = (steerTheta.ravel(), steerPhi.ravel())
+
+    # Only elements without a cached result are dispatched
+    cache = None
+    keys = []
+    cached = []
+    toSolve = np.arange(len(solveArray))
+    if not args.nocache:
+        cache = ResultCache(args.cachedir, args.cachesize * 1e6)
+        pluginHash = PluginHash(type)
+        keys = [cache.Key(pluginHash, element, np.concatenate((physics, freqs)), grid) for element in solveArray]
+        toSolve = cache.Missing(keys)
+        cached = sorted(set(range(len(solveArray))) - set(toSolve))
+
+    # Workers & elements per task not given are planned from the recorded timings of this element type, see Planner.py.
+    # On Golem within the budget's share for the first run, the rest is kept for retries & speculative copies
+    golem = args.backend == 'golem'
+    model = TimingModel(type, args.backend, len(freqs) * grid.size)
+    plan = PlanRun(model, len(toSolve), args.target, args.maxworkers if args.maxworkers > 0 else MaxWorkers(args.backend),
+                   args.budget * (1 - Backends.RETRY_SHARE) if golem else None, args.price if golem else 0.0, args.workers or None, args.batchsize or None)
+    if len(toSolve) > 0:
+        print(model)
+        print(plan)
+        if plan.estimate > args.target:
+            print("Target of {:.0f}s can't be met within {} workers and budget, using the fastest plan".format(args.target, plan.workers))
 
-    # Save each Element config in separate file to pass to Golem workers
-    for elementNo in range(noElements):
-        np.savetxt('./elements/element' + str(elementNo) + '.csv', ElementArray[elementNo], delimiter=',')
+    # Save Element configs in packed batch files, one per Golem task
+    noBatches = SaveBatches(solveArray, plan.batchSize, toSolve)
+    # Identifies the run's inputs in the task journal, so --resume only reuses results of the same inputs
+    runKey = RunKey(['./elements/' + file for file in Backends.SHARED_INPUTS] + [Backends.BatchInputPath(batchNo) for batchNo in range(noBatches)],
+                    (PluginHash(type),))
 
     """
     An element 'type' must have a matching folder in root dir.
     This folder should include all required scripts for analysing that specific element type along with a runAnalysis.py script.
-    The runAnalysis.py is a common script that will be run by each worker. The script should run the analysis for that specific element
-    (using files from element folder) and save the result in an elementresult.csv.
+    The runAnalysis.py is a common script that will be run by each worker. The script should run the analysis for each element in batch.npz
+    (using files from element folder) and save the results in an elementresult.npz (see Results.py for format and Backends.py for the full contract).
     This setup allows makes this solver easily extensible to analyse many different element types without the user requiring knowledge of the Golem system.
     """
     print(f"Analysing element type: {type}")
@@ -128,9 +428,12 @@ if __name__ == "__main__":
         print("Antenna Scripts Must Include A runAnalysis.py")
         sys.exit()
 
-    golemArgs = { 'noElements': noElements, 'type': type, 'files': directories, 'freq': freq }
+    golemArgs = { 'noElements': noElements, 'noBatches': noBatches, 'backend': args.backend, 'workers': plan.workers, 'plan': plan,
+                  'backendOptions': {'budget': args.budget} if golem else {}, 'type': type, 'files': directories, 'freq': freq, 'freqs': freqs, 'grid': grid, 'patternArray': patternArray,
+                  'solveArray': solveArray, 'cache': cache, 'keys': keys, 'cached': cached, 'partial': args.partial, 'sweep': sweep,
+                  'adaptive': args.adaptive, 'adaptiveSamples': args.adaptivesamples, 'physics': physics, 'query': ParseDirections(args.query) if args.query is not None else None,
+                  'metrics': args.metrics, 'retries': args.retries, 'speculate': args.speculate, 'resume': args.resume, 'runKey': runKey }
 
-    enable_default_logger()
     loop = asyncio.get_event_loop()
     task = loop.create_task(main(args=golemArgs))
     try:
@@ -0,0 +1,30 @@
+""" Adaptive refinement sample budget."""
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Adaptive import RefinePattern
+
+
+def Beam(thetaDeg, phiDeg):
+    """Narrow beam with sidelobes & nulls, sin(x)/x in theta."""
+    return np.sinc(np.asarray(thetaDeg) / 4) + 0j * np.asarray(phiDeg)
+
+
+def test_unlimited_refinement_exceeds_budget():
+    assert RefinePattern(Beam, 90, 360, MaxLevel=4).size > 20000
+
+
+def test_budget_limits_samples():
+    pattern = RefinePattern(Beam, 90, 360, MaxLevel=4, MaxSamples=20000)
+
+    assert pattern.size <= 20000
+    assert pattern.size > 20000 - 1000                                          # Budget used, not stopped early
+
+
+def test_budget_refines_worst_cells():
+    """Limited samples still go to the main beam & first nulls, where the pattern changes fastest."""
+    pattern = RefinePattern(Beam, 90, 360, MaxLevel=4, MaxSamples=20000)
+
+    assert np.mean(pattern.theta < 12) > 0.5
@@ -0,0 +1,112 @@
+""" Separable (rectangular lattice) array factor vs the general point sum, and the layouts that fall back to the point sum."""
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Layout
+from ArrayPattern import ArrayFactorComplex, ArrayFactorPoints, PointArrayFactor, PointArrayFactorPoints, RectangularLayout, SeparableArrayFactor
+from Grid import AngularGrid
+
+FREQ = 14e9
+SPACING = 0.012
+GRID = AngularGrid.Uniform(90, 360, 3, 5)
+
+
+def Rectangular(X_Elements, Y_Elements, spacing=SPACING):
+    return Layout.Rectangular(X_Elements, Y_Elements, spacing)
+
+
+def test_uniform_lattice_matches_point_sum():
+    ElementArray = Rectangular(8, 6)
+    arrayFactor = SeparableArrayFactor(RectangularLayout(ElementArray), FREQ, GRID)
+
+    assert arrayFactor is not None
+    np.testing.assert_allclose(arrayFactor, PointArrayFactor(ElementArray, FREQ, GRID), rtol=1e-9, atol=1e-9)
+
+
+def test_tapered_steered_lattice_matches_point_sum():
+    ElementArray = Layout.ApplyTaper(Rectangular(10, 7), 'taylor', -30)
+    ElementArray[:, 4] = -2 * np.pi * FREQ / 3e8 * np.sin(np.radians(20)) * ElementArray[:, 0]   # Steered 20° in the x-z plane
+    ElementArray[:, 2] = 0.004                                                  # Off the z = 0 plane
+    arrayFactor = SeparableArrayFactor(RectangularLayout(ElementArray), FREQ, GRID)
+
+    assert arrayFactor is not None
+    np.testing.assert_allclose(arrayFactor, PointArrayFactor(ElementArray, FREQ, GRID), rtol=1e-9, atol=1e-9)
+
+
+def test_non_uniform_spacing_matches_point_sum():
+    x, y = np.meshgrid([-0.03, -0.011, 0.004, 0.02, 0.041], [-0.02, 0, 0.013, 0.031])
+    ElementArray = Layout.Elements(x, y)
+    arrayFactor = SeparableArrayFactor(RectangularLayout(ElementArray), FREQ, GRID)
+
+    assert arrayFactor is not None
+    np.testing.assert_allclose(arrayFactor, PointArrayFactor(ElementArray, FREQ, GRID), rtol=1e-9, atol=1e-9)
+
+
+def test_small_rank_weights_match_point_sum():
+    ElementArray = Rectangular(12, 12)
+    x = ElementArray[:, 0] / SPACING
+    y = ElementArray[:, 1] / SPACING
+    weights = 1 + 0.3 * np.cos(x) * np.sin(y)                                   # Rank 2
+    ElementArray[:, 3] = np.abs(weights)
+    arrayFactor = SeparableArrayFactor(RectangularLayout(ElementArray), FREQ, GRID)
+
+    assert arrayFactor is not None
+    np.testing.assert_allclose(arrayFactor, PointArrayFactor(ElementArray, FREQ, GRID), rtol=1e-9, atol=1e-9)
+
+
+def test_single_row_falls_back():
+    ElementArray = Rectangular(1, 9)
+    layout = RectangularLayout(ElementArray)
+
+    assert layout is not None
+    assert SeparableArrayFactor(layout, FREQ, GRID) is None                     # Rank 1 x (1 + 9) isn't less than 9 elements
+    np.testing.assert_allclose(ArrayFactorComplex(ElementArray, FREQ, GRID), PointArrayFactor(ElementArray, FREQ, GRID))
+
+
+def test_high_rank_weights_fall_back():
+    ElementArray = Rectangular(4, 4)
+    random = np.random.default_rng(1)
+    ElementArray[:, 3] = random.uniform(0.2, 1, len(ElementArray))
+    ElementArray[:, 4] = random.uniform(-np.pi, np.pi, len(ElementArray))
+
+    assert SeparableArrayFactor(RectangularLayout(ElementArray), FREQ, GRID) is None
+    np.testing.assert_allclose(ArrayFactorComplex(ElementArray, FREQ, GRID), PointArrayFactor(ElementArray, FREQ, GRID))
+
+
+def test_lattice_with_holes_falls_back():
+    ElementArray = np.delete(Rectangular(5, 5), [7, 12], axis=0)
+
+    assert RectangularLayout(ElementArray) is None
+    np.testing.assert_allclose(ArrayFactorComplex(ElementArray, FREQ, GRID), PointArrayFactor(ElementArray, FREQ, GRID))
+
+
+def test_repeated_positions_fall_back():
+    ElementArray = Rectangular(3, 3)
+    ElementArray[4, 0:2] = ElementArray[0, 0:2]                                 # Two elements at one lattice point, another missing
+
+    assert RectangularLayout(ElementArray) is None
+
+
+def test_non_rectangular_layouts_fall_back():
+    assert RectangularLayout(Layout.Triangular(6, 5, SPACING)) is None
+    assert RectangularLayout(Layout.Circular(3, SPACING)) is None
+    ElementArray = Rectangular(4, 4)
+    ElementArray[5, 2] = 0.01                                                   # Not all in one z plane
+
+    assert RectangularLayout(ElementArray) is None
+
+
+def test_scattered_points_match_grid():
+    """Points & grids share one kernel, scattered directions match the grid path at the same directions."""
+    random = np.random.default_rng(2)
+    theta = random.uniform(0, 180, 500)
+    phi = random.uniform(0, 360, 500)
+    for ElementArray in (Layout.ApplyTaper(Rectangular(9, 6), 'taylor', -30), Layout.Triangular(6, 5, SPACING)):
+        grid = AngularGrid(theta[:20], phi[:20])
+        gridTheta, gridPhi = np.meshgrid(grid.theta, grid.phi)
+
+        np.testing.assert_allclose(ArrayFactorPoints(ElementArray, FREQ, theta, phi), PointArrayFactorPoints(ElementArray, FREQ, theta, phi),
+                                   rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(ArrayFactorPoints(ElementArray, FREQ, gridTheta, gridPhi), ArrayFactorComplex(ElementArray, FREQ, grid))
@@ -0,0 +1,71 @@
+""" Vectorized patch element field vs the original scalar loop over PatchFunction, cart2sph1 & CalculateRelativePhase."""
+import math
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Patch'))     # Plug-in modules are flat imports, as on a worker
+from RectPatch import PatchFunction, cart2sph1, sph2cart1, GetPatchModel
+from ArrayFactor import CalculateRelativePhase
+from PatchArray import FieldSumPatchElement, FieldSumPatchElementFreqs, FieldSumPatchElementPoints
+
+FREQ = 14e9
+PATCH = (10.7e-3, 10.7e-3, 3e-3, 2.5)                                           # W, L, h, Er - requestor defaults
+THETA = np.arange(0, 90, 3)
+PHI = np.arange(0, 360, 7)
+
+
+def ScalarFieldSum(element, Freq, W, L, h, Er, ThetaDeg, PhiDeg):
+    """The original one point at a time FieldSumPatchElement, over ThetaDeg x PhiDeg. Returns field[phi][theta]."""
+    Lambda = 3e8 / Freq
+    field = np.full((len(PhiDeg), len(ThetaDeg)), 1e-9 + 0j)
+
+    for thetaNo, theta in enumerate(ThetaDeg):
+        for phiNo, phi in enumerate(PhiDeg):
+            elementSum = 1e-9 + 0j
+            xff, yff, zff = sph2cart1(999, math.radians(theta), math.radians(phi))
+            r, thetaLocal, phiLocal = cart2sph1(xff - element[0], yff - element[1], zff - element[2])
+            patchFunction = PatchFunction(math.degrees(thetaLocal), math.degrees(phiLocal), Freq, W, L, h, Er)
+            if patchFunction != 0:
+                relativePhase = CalculateRelativePhase(element, Lambda, math.radians(theta), math.radians(phi))
+                elementSum += element[3] * patchFunction * math.e ** ((relativePhase + element[4]) * 1j)
+            field[phiNo][thetaNo] = elementSum
+
+    return field
+
+
+@pytest.fixture(autouse=True)
+def ColdModels():
+    GetPatchModel.cache_clear()                                                 # Memoized grids would otherwise carry between tests
+
+
+def test_off_origin_phase_weighted_element_matches_scalar():
+    element = [0.024, -0.012, 0.003, 0.7, 1.1]
+    expected = ScalarFieldSum(element, FREQ, *PATCH, THETA, PHI)
+
+    np.testing.assert_allclose(FieldSumPatchElement(element, FREQ, *PATCH, THETA, PHI), expected, rtol=1e-9, atol=1e-12)
+
+
+def test_origin_element_matches_scalar():
+    element = [0, 0, 0, 0.5, -0.6]                                              # Memoized model grid shortcut
+    expected = ScalarFieldSum(element, FREQ, *PATCH, THETA, PHI)
+
+    np.testing.assert_allclose(FieldSumPatchElement(element, FREQ, *PATCH, THETA, PHI), expected, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(FieldSumPatchElement(element, FREQ, *PATCH, THETA, PHI), expected, rtol=1e-9, atol=1e-12)  # Memo hit
+
+
+def test_origin_shortcut_matches_general_path():
+    element = np.array([0, 0, 0, 1, 0.3])
+    thetaDeg, phiDeg = np.meshgrid(THETA, PHI)
+
+    np.testing.assert_allclose(FieldSumPatchElementFreqs(element, [12e9, FREQ], *PATCH, THETA, PHI),
+                               FieldSumPatchElementPoints(element, [12e9, FREQ], *PATCH, thetaDeg, phiDeg), rtol=1e-9, atol=1e-12)
+
+
+def test_each_frequency_matches_scalar():
+    element = [-0.03, 0.018, 0, 1, 0.4]
+    fields = FieldSumPatchElementFreqs(element, [12e9, 16e9], *PATCH, THETA, PHI)
+
+    for field, Freq in zip(fields, [12e9, 16e9]):
+        np.testing.assert_allclose(field, ScalarFieldSum(element, Freq, *PATCH, THETA, PHI), rtol=1e-9, atol=1e-12)
@@ -0,0 +1,55 @@
+""" Cut & front/back metrics on grids that don't hold the planes or directions they need."""
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Grid import AngularGrid
+from PatternMetrics import CutMetrics, FrontToBack, PlaneCut, PatternSummary
+
+
+def Beam(grid, backLevel):
+    """cos^8(theta) front hemisphere with a constant backLevel (linear) behind, fsp[1][phi][theta]."""
+    theta, phi = np.meshgrid(np.radians(grid.theta), np.radians(grid.phi))
+    field = np.where(theta <= np.pi / 2, np.abs(np.cos(theta)) ** 8, backLevel) + 0j
+    return field[np.newaxis]
+
+
+def test_missing_plane_raises():
+    grid = AngularGrid.Uniform(90, 180, 1, 1)                                   # phi 0°-179°, no phi = 180° or 270° planes
+    fieldDb = 20 * np.log10(np.abs(Beam(grid, 0)[0]) + 1e-12)
+
+    with pytest.raises(ValueError):
+        PlaneCut(fieldDb, grid, 0)
+    assert np.all(np.isnan(CutMetrics(fieldDb, grid, 90)))
+
+
+def test_off_grid_plane_raises():
+    grid = AngularGrid.Uniform(90, 360, 1, 2)                                   # Even phi only
+
+    with pytest.raises(ValueError):
+        PlaneCut(np.zeros(grid.shape), grid, 45)
+
+
+def test_front_to_back():
+    grid = AngularGrid.Uniform(180, 360, 1, 5)
+    row = PatternSummary(Beam(grid, 0.01), [1e9], grid)[0]
+
+    assert row['frontToBack_dB'] == pytest.approx(40)
+    assert row['beamwidthE_deg'] == pytest.approx(row['beamwidthH_deg'])
+
+
+def test_front_to_back_without_back_radiation_is_unbounded():
+    grid = AngularGrid.Uniform(180, 360, 1, 5)
+    fieldDb = 20 * np.log10(np.abs(Beam(grid, 1e-9)[0]) + 1e-12)               # The fields' floor behind
+
+    assert FrontToBack(fieldDb, grid, 0, 0) == np.inf
+
+
+def test_front_to_back_off_grid_is_nan():
+    front = AngularGrid.Uniform(90, 360, 1, 5)
+    halfPhi = AngularGrid.Uniform(180, 180, 1, 5)
+
+    assert np.isnan(PatternSummary(Beam(front, 0.01), [1e9], front)[0]['frontToBack_dB'])
+    assert np.isnan(PatternSummary(Beam(halfPhi, 0.01), [1e9], halfPhi)[0]['frontToBack_dB'])
@@ -0,0 +1,187 @@
+""" Scheduler retries, speculative copies & resuming, driven by fake executors/backends in place of Golem or the process pool."""
+import asyncio
+import json
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Results import BatchResultPath
+from Scheduler import Scheduler, TaskJournal, RoundExecutor
+
+
+class FakeExecutor:
+    """
+    Execute(batchNo) finishing after seconds[batchNo] (default 0.01 s), failing the first failures[batchNo] attempts and
+    hanging (until cancelled) on the first attempt of batches in hang. Writes an empty result file, as a backend would.
+    """
+
+    def __init__(self, seconds=None, failures=None, hang=()):
+        self.seconds = seconds or {}
+        self.failures = failures or {}
+        self.hang = hang
+        self.calls = {}
+        self.cancelled = []
+
+    async def Execute(self, batchNo):
+        attempt = self.calls[batchNo] = self.calls.get(batchNo, 0) + 1
+        try:
+            if batchNo in self.hang and attempt == 1:
+                await asyncio.sleep(100)
+            await asyncio.sleep(self.seconds.get(batchNo, 0.01))
+        except asyncio.CancelledError:
+            self.cancelled.append(batchNo)
+            raise
+        if attempt <= self.failures.get(batchNo, 0):
+            raise RuntimeError("provider died")
+        open(BatchResultPath(batchNo), 'w').close()
+        return batchNo
+
+
+class FakeBackend:
+    """
+    Backend with Run(batchNos) yielding each batch in turn after 0.01 s, except batches in hang which never finish in the first round.
+    Records each round's batches & those cancelled.
+    """
+
+    def __init__(self, hang=()):
+        self.hang = hang
+        self.rounds = []
+        self.cancelled = []
+        self.closed = False
+
+    async def Run(self, batchNos, onFailure=None):
+        self.rounds.append(list(batchNos))
+        first = len(self.rounds) == 1
+        try:
+            for batchNo in sorted(batchNos, key=lambda batchNo: first and batchNo in self.hang):
+                await asyncio.sleep(100 if first and batchNo in self.hang else 0.01)
+                open(BatchResultPath(batchNo), 'w').close()
+                yield batchNo
+        except asyncio.CancelledError:
+            self.cancelled.append(list(batchNos))
+            raise
+
+    def Close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def results(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('results')
+    return tmp_path
+
+
+def Collect(scheduler, batchNos):
+    async def Run():
+        return [batchNo async for batchNo in scheduler.Run(batchNos)]
+    return asyncio.run(Run())
+
+
+def JournalStates(path='./results/journal.jsonl'):
+    with open(path) as f:
+        return [json.loads(line) for line in f][1:]
+
+
+def test_failed_batch_is_retried(results):
+    executor = FakeExecutor(failures={2: 2})
+    journal = TaskJournal('./results/journal.jsonl', 'key', 4)
+    done = Collect(Scheduler(executor, journal, retries=2, speculatePercentile=0, pollInterval=0.01), range(4))
+    journal.Close()
+
+    assert sorted(done) == [0, 1, 2, 3]
+    assert executor.calls[2] == 3
+    assert [entry['state'] for entry in JournalStates() if entry['batch'] == 2] == ['running', 'failed', 'running', 'failed', 'running', 'done']
+
+
+def test_batch_failing_every_retry_is_raised(results):
+    executor = FakeExecutor(failures={1: 10})
+    journal = TaskJournal('./results/journal.jsonl', 'key', 3)
+    done = []
+
+    async def Run():
+        async for batchNo in Scheduler(executor, journal, retries=1, speculatePercentile=0, pollInterval=0.01).Run(range(3)):
+            done.append(batchNo)
+
+    with pytest.raises(RuntimeError, match="1: provider died"):
+        asyncio.run(Run())
+    journal.Close()
+
+    assert sorted(done) == [0, 2]
+    assert executor.calls[1] == 2
+
+
+def test_straggler_gets_one_speculative_copy(results):
+    executor = FakeExecutor(hang=(5,))
+    journal = TaskJournal('./results/journal.jsonl', 'key', 8)
+    done = Collect(Scheduler(executor, journal, speculatePercentile=90, minCompleted=3, pollInterval=0.01), range(8))
+    journal.Close()
+
+    assert sorted(done) == list(range(8))
+    assert executor.calls[5] == 2                                              # Hanging first copy & the speculative one that won
+    assert executor.cancelled == [5]                                            # Losing copy is stopped
+    assert any(entry.get('speculative') for entry in JournalStates() if entry['batch'] == 5)
+    assert all(calls == 1 for batchNo, calls in executor.calls.items() if batchNo != 5)
+
+
+def test_no_speculation_when_turned_off(results):
+    executor = FakeExecutor(seconds={3: 0.3})
+    journal = TaskJournal('./results/journal.jsonl', 'key', 6)
+    Collect(Scheduler(executor, journal, speculatePercentile=0, pollInterval=0.01), range(6))
+    journal.Close()
+
+    assert executor.calls[3] == 1
+
+
+def test_resume_skips_batches_done(results):
+    journal = TaskJournal('./results/journal.jsonl', 'key', 4)
+    Collect(Scheduler(FakeExecutor(), journal, pollInterval=0.01), [0, 2])     # Interrupted after two batches
+    journal.Close()
+
+    journal = TaskJournal('./results/journal.jsonl', 'key', 4, resume=True)
+    assert journal.Done() == [0, 2]
+    executor = FakeExecutor()
+    pending = [batchNo for batchNo in range(4) if batchNo not in journal.Done()]
+    done = Collect(Scheduler(executor, journal, pollInterval=0.01), pending)
+    journal.Close()
+
+    assert sorted(done) == [1, 3]
+    assert sorted(executor.calls) == [1, 3]
+
+
+def test_resume_needs_result_files_and_same_run(results):
+    journal = TaskJournal('./results/journal.jsonl', 'key', 3)
+    Collect(Scheduler(FakeExecutor(), journal, pollInterval=0.01), range(3))
+    journal.Close()
+    os.remove(BatchResultPath(1))
+
+    journal = TaskJournal('./results/journal.jsonl', 'key', 3, resume=True)
+    assert journal.Done() == [0, 2]
+    journal.Close()
+
+    journal = TaskJournal('./results/journal.jsonl', 'other inputs', 3, resume=True)
+    assert journal.Done() == []
+    journal.Close()
+
+
+def test_round_executor_cancels_losing_round(results):
+    backend = FakeBackend(hang=(1,))
+    executor = RoundExecutor(backend)
+    journal = TaskJournal('./results/journal.jsonl', 'key', 4)
+
+    async def Run():
+        done = [batchNo async for batchNo in Scheduler(executor, journal, minCompleted=2, pollInterval=0.01).Run([1, 2, 3])]
+        await asyncio.sleep(0.05)
+        cancelled = list(backend.cancelled)
+        await executor.Close()
+        return done, cancelled
+
+    done, cancelled = asyncio.run(Run())
+    journal.Close()
+
+    assert sorted(done) == [1, 2, 3]
+    assert backend.rounds[0] == [1, 2, 3]
+    assert [1] in backend.rounds[1:]                                            # Speculative copy of the straggler in a new round
+    assert cancelled == [[1, 2, 3]]                                             # First round stopped once its copy of batch 1 lost
+    assert backend.closed